@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Compares client key algorithms on issue latency and inline config size."""
+
+import os
+import sys
+import time
+import datetime
+import tempfile
+from types import SimpleNamespace
+
+import pystache
+from cryptography import x509
+from cryptography.x509.oid import NameOID
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+CONTAINER = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, CONTAINER)
+
+# pylint: disable=C0413
+from simplified_openvpn_pki import SimplifiedOpenvpnPki
+
+ALGORITHMS = [('RSA-2048', 'rsa', None), ('P-256', 'ec', 'prime256v1'), ('Ed25519', 'ed', 'ed25519')]
+ROUNDS = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+
+def create_pki(easy_rsa_dir):
+    """Creates throwaway Easy RSA 3 style PKI with RSA CA."""
+    pki_dir = easy_rsa_dir + 'pki/'
+    for directory in ['private', 'issued', 'reqs', 'certs_by_serial']:
+        os.makedirs(pki_dir + directory)
+
+    key = rsa.generate_private_key(65537, 2048, default_backend())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'Benchmark CA')])
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    builder = x509.CertificateBuilder().subject_name(name).issuer_name(name)
+    builder = builder.public_key(key.public_key()).serial_number(1)
+    builder = builder.not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))
+    builder = builder.add_extension(x509.BasicConstraints(True, None), True)
+    cert = builder.sign(key, hashes.SHA256(), default_backend())
+
+    with open(pki_dir + 'ca.crt', 'wb') as ca_cert_file:
+        ca_cert_file.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(pki_dir + 'private/ca.key', 'wb') as ca_key_file:
+        ca_key_file.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()))
+    open(pki_dir + 'index.txt', 'w').close()
+
+
+def main():
+    """Issues certificates with every algorithm and prints results."""
+    renderer = pystache.Renderer()
+    template = CONTAINER + '/templates/client.mustache'
+
+    print('Algorithm   keygen ms   sign ms   inline .ovpn bytes')
+
+    for label, key_algo, key_curve in ALGORITHMS:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            easy_rsa_dir = temp_dir + '/'
+            create_pki(easy_rsa_dir)
+            pki = SimplifiedOpenvpnPki(stub_config(easy_rsa_dir))
+            pki.load_ca()
+            keygen_time = 0.0
+            sign_time = 0.0
+
+            for index in range(ROUNDS):
+                start = time.perf_counter()
+                key = pki.generate_private_key(key_algo, key_curve)
+                keygen_time += time.perf_counter() - start
+
+                start = time.perf_counter()
+                cert = pki.issue_certificate('client-' + str(index), key)
+                sign_time += time.perf_counter() - start
+
+            options = dict()
+            options['protocol'] = 'udp'
+            options['hostname'] = 'vpn.example.com'
+            options['port'] = 1194
+            options['inline'] = True
+            options['ca'] = open(pki.ca_cert_path).read().rstrip()
+            options['cert'] = cert.decode().rstrip()
+            options['key'] = key.decode().rstrip()
+            options['ta'] = 'x' * 636
+            size = len(renderer.render_path(template, options).encode())
+
+            print('%-11s %9.2f %9.2f %20d' % (
+                label, keygen_time / ROUNDS * 1000, sign_time / ROUNDS * 1000, size))
+
+
+def stub_config(easy_rsa_dir):
+    """Returns minimal stand-in for SimplifiedOpenvpnConfig."""
+    return SimpleNamespace(easy_rsa_ver=3, easy_rsa_dir=easy_rsa_dir)
+
+
+if __name__ == '__main__':
+    main()
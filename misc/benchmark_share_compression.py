@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Measures download size and time of client's config files with every content encoding.
+
+Usage: benchmark_share_compression.py URL
+
+URL is client's share page, every config file linked from it gets downloaded without
+compression and with every encoding share server offers. Besides measured time, time on slow
+mobile links is estimated from size, bandwidth and round trip time of the link.
+"""
+
+import re
+import sys
+import time
+import http.client
+from urllib.parse import urlsplit
+
+# Name, bandwidth in bits per second and round trip time in seconds.
+LINKS = [
+    ('2G', 50 * 1000, 0.5),
+    ('3G', 400 * 1000, 0.2),
+    ('slow 4G', 1600 * 1000, 0.15),
+]
+
+ENCODINGS = ['identity', 'gzip', 'br']
+
+
+def download(parts, path, encoding):
+    """Downloads path with given Accept-Encoding, returns size, encoding and seconds."""
+    connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+    start = time.perf_counter()
+    connection.request('GET', path, headers={'Accept-Encoding': encoding})
+    response = connection.getresponse()
+    size = len(response.read())
+    elapsed = time.perf_counter() - start
+    connection.close()
+    return size, response.getheader('Content-Encoding', 'identity'), elapsed
+
+
+def main():
+    """Downloads every config file with every encoding and prints sizes and times."""
+    if len(sys.argv) != 2:
+        print('> Usage: ' + sys.argv[0] + ' URL')
+        exit(1)
+
+    url = sys.argv[1].rstrip('/')
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+    connection.request('GET', parts.path)
+    page = connection.getresponse().read().decode('utf-8')
+    connection.close()
+
+    print('%-36s %-9s %8s %9s' % ('file', 'encoding', 'bytes', 'local') +
+          ''.join(['%10s' % link[0] for link in LINKS]))
+
+    for href in re.findall(r'href="([^"]+)"', page):
+        path = parts.path + '/' + href.split('/')[-1]
+        for encoding in ENCODINGS:
+            size, used, elapsed = download(parts, path, encoding)
+            # Server falls back to identity for encodings it can't produce.
+            if used != encoding:
+                continue
+
+            estimates = [rtt * 2 + size * 8 / bandwidth for _, bandwidth, rtt in LINKS]
+            print('%-36s %-9s %8d %7.1fms' % (href.split('/')[-1], used, size, elapsed * 1000) +
+                  ''.join(['%9.2fs' % estimate for estimate in estimates]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Measures share hash lookups per second with SQL read from disk per query and from registry."""
+
+import os
+import sys
+import time
+import tempfile
+from types import SimpleNamespace
+
+CONTAINER = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, CONTAINER)
+
+# pylint: disable=C0413
+from simplified_openvpn_helper import SimplifiedOpenvpnHelper as _helper
+from simplified_openvpn_data import SimplifiedOpenvpnData
+
+CLIENTS = 10000
+LOOKUPS = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+
+def lookup_from_disk(data, share_hash):
+    """Looks up slug the way it was done before statement registry existed."""
+    sql = _helper.read_file_as_value(CONTAINER + '/sql/find_client_slug_by_hash.sql')
+    with data.connection() as db:
+        cursor = db.cursor()
+        cursor.execute(sql, [share_hash])
+        return cursor.fetchone()
+
+
+def main():
+    """Runs both lookup variants against the same database and prints their rate."""
+    config = SimpleNamespace(container=CONTAINER + '/')
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data = SimplifiedOpenvpnData(config, temp_dir + '/sovpn.sqlite')
+        hashes = [_helper.generate_share_hash('client-' + str(index)) for index in range(CLIENTS)]
+        data.insert_share_hashes(
+            ('client-' + str(index), share_hash) for index, share_hash in enumerate(hashes))
+
+        for label, lookup in [
+                ('sql file per query', lambda share_hash: lookup_from_disk(data, share_hash)),
+                ('statement registry', data.find_client_slug_by_share_hash)]:
+            start = time.perf_counter()
+            for index in range(LOOKUPS):
+                lookup(hashes[index % CLIENTS])
+            elapsed = time.perf_counter() - start
+            print('%-20s %12.0f lookups/s' % (label, LOOKUPS / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Measures share hash rotation time for growing number of clients to show it scales linearly."""
+
+import os
+import sys
+import time
+import tempfile
+from types import SimpleNamespace
+
+CONTAINER = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, CONTAINER)
+
+# pylint: disable=C0413
+from simplified_openvpn_helper import SimplifiedOpenvpnHelper as _helper
+from simplified_openvpn_data import SimplifiedOpenvpnData
+
+SIZES = [int(size) for size in sys.argv[1:]] or [12500, 25000, 50000, 100000]
+
+
+def main():
+    """Rotates hashes of generated client sets and prints time per client."""
+    config = SimpleNamespace(container=CONTAINER + '/')
+    print('Clients   seconds   microseconds per client')
+
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            data = SimplifiedOpenvpnData(config, temp_dir + '/sovpn.sqlite')
+            data.insert_share_hashes(
+                ('client-' + str(index), _helper.generate_share_hash('client-' + str(index)))
+                for index in range(size))
+
+            start = time.perf_counter()
+            data.rotate_share_hashes(
+                lambda slug, renewals: _helper.generate_share_hash(slug, 'rotated', renewals),
+                verbose=False)
+            elapsed = time.perf_counter() - start
+
+            print('%7d %9.3f %25.2f' % (size, elapsed, elapsed / size * 1000000))
+
+
+if __name__ == '__main__':
+    main()
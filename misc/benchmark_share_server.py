@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Load tests running share server and reports requests per second and latency percentiles.
+
+Usage: benchmark_share_server.py [--generate N] [--concurrency C] [--duration S] [--close] [URL]
+
+Client pages and config files of all clients in database are requested in round robin, with
+--generate N clients named loadtest-N get created first. Share server has to be started with
+'sovpn.py share' separately, --close disables keep-alive.
+"""
+
+import os
+import sys
+import time
+import threading
+import http.client
+from urllib.parse import urlsplit
+
+CONTAINER = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, CONTAINER)
+
+# pylint: disable=C0413
+from simplified_openvpn import SimplifiedOpenvpn
+from simplified_openvpn_config import SimplifiedOpenvpnConfig
+from simplified_openvpn_data import SimplifiedOpenvpnData
+from simplified_openvpn_share import SimplifiedOpenvpnShare
+
+
+def parse_arguments(arguments):
+    """Returns options from command line arguments."""
+    options = dict()
+    options['generate'] = 0
+    options['concurrency'] = 16
+    options['duration'] = 10.0
+    options['keep_alive'] = True
+    options['url'] = None
+
+    while arguments:
+        argument = arguments.pop(0)
+        if argument == '--close':
+            options['keep_alive'] = False
+        elif argument in ['--generate', '--concurrency', '--duration']:
+            options[argument[2:]] = type(options[argument[2:]])(arguments.pop(0))
+        else:
+            options['url'] = argument
+    return options
+
+
+def collect_paths(config):
+    """Returns paths of client pages and config files of every client in database."""
+    data = SimplifiedOpenvpnData(config, read_only=True)
+    share = SimplifiedOpenvpnShare(config)
+    paths = list()
+
+    for slug in data.get_all_client_slugs():
+        share_hash = data.find_client_share_hash_by_slug(slug)
+        if not share_hash or not os.path.isdir(config.clients_dir + slug):
+            continue
+
+        paths.append('/' + share_hash)
+        for config_file in share.config_files(slug):
+            paths.append('/' + share_hash + '/' + config_file)
+    return paths
+
+
+def load(url, paths, offset, deadline, keep_alive, results):
+    """Requests paths until deadline and records latency of every request."""
+    parts = urlsplit(url)
+    connection = None
+    latencies = list()
+    errors = 0
+    received = 0
+    index = offset
+
+    while time.perf_counter() < deadline:
+        if connection is None:
+            connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+
+        headers = dict() if keep_alive else {'Connection': 'close'}
+        start = time.perf_counter()
+        try:
+            connection.request('GET', paths[index % len(paths)], headers=headers)
+            response = connection.getresponse()
+            received += len(response.read())
+            if response.status != 200:
+                errors += 1
+            if not keep_alive or response.will_close:
+                connection.close()
+                connection = None
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            connection = None
+        latencies.append(time.perf_counter() - start)
+        index += 1
+
+    results.append((latencies, errors, received))
+
+
+def percentile(values, fraction):
+    """Returns value at given fraction of sorted values."""
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def main():
+    """Generates clients if asked, runs load and prints summary."""
+    options = parse_arguments(sys.argv[1:])
+    config = SimplifiedOpenvpnConfig()
+
+    if options['generate']:
+        SimplifiedOpenvpn().create_clients(
+            ['loadtest-' + str(index) for index in range(options['generate'])])
+
+    paths = collect_paths(config)
+    if not paths:
+        print('> No clients to request, use --generate N to create some.')
+        exit(1)
+
+    url = options['url'] or 'http://127.0.0.1:' + str(config.sovpn_share_port)
+    deadline = time.perf_counter() + options['duration']
+    results = list()
+    threads = list()
+
+    for offset in range(options['concurrency']):
+        thread = threading.Thread(
+            target=load,
+            args=(url, paths, offset * 7, deadline, options['keep_alive'], results))
+        thread.start()
+        threads.append(thread)
+
+    for thread in threads:
+        thread.join()
+
+    latencies = sorted(latency for result in results for latency in result[0])
+    errors = sum(result[1] for result in results)
+    received = sum(result[2] for result in results)
+
+    print('%-12s %12d' % ('requests', len(latencies)))
+    print('%-12s %12d' % ('errors', errors))
+    print('%-12s %12.0f' % ('requests/s', len(latencies) / options['duration']))
+    print('%-12s %12.1f' % ('MB/s', received / options['duration'] / 1024 / 1024))
+    print('%-12s %10.2fms' % ('p50', percentile(latencies, 0.50) * 1000))
+    print('%-12s %10.2fms' % ('p99', percentile(latencies, 0.99) * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,14 +4,80 @@
 """Management interface for OpenVPN Community Edition."""
 
 import os
-import zipfile
+import json
+import time
+import hashlib
 from shutil import copyfile
 from subprocess import run
-import pystache
+from concurrent.futures import ProcessPoolExecutor
 
 from simplified_openvpn_helper import SimplifiedOpenvpnHelper as _helper
 from simplified_openvpn_config import SimplifiedOpenvpnConfig
 from simplified_openvpn_data import SimplifiedOpenvpnData
+from simplified_openvpn_pki import SimplifiedOpenvpnPki
+from simplified_openvpn_keypool import SimplifiedOpenvpnKeypool
+from simplified_openvpn_template import SimplifiedOpenvpnTemplate
+from simplified_openvpn_assets import SimplifiedOpenvpnAssets
+from simplified_openvpn_index import SimplifiedOpenvpnIndex
+
+def generate_client_request(easy_rsa_dir, easy_rsa_ver, slug, key_algo='rsa', key_curve=None):
+    """Generates private key and certificate request for client, safe to run in parallel."""
+    if easy_rsa_ver == 2:
+        cmd = './pkitool --csr ' + slug + ' 1> /dev/null'
+    else:
+        cmd = './easyrsa --batch --req-cn=' + slug
+        if key_algo != 'rsa':
+            cmd += ' --use-algo=' + key_algo + ' --curve=' + key_curve
+        cmd += ' gen-req ' + slug + ' nopass 1> /dev/null'
+
+    return run(cmd, shell=True, cwd=easy_rsa_dir).returncode == 0
+
+
+def write_client_request(easy_rsa_dir, easy_rsa_ver, slug, key):
+    """Places existing key and its certificate request to Easy RSA's directory."""
+    if easy_rsa_ver == 2:
+        key_path = easy_rsa_dir + 'keys/' + slug + '.key'
+        request_path = easy_rsa_dir + 'keys/' + slug + '.csr'
+    else:
+        key_path = easy_rsa_dir + 'pki/private/' + slug + '.key'
+        request_path = easy_rsa_dir + 'pki/reqs/' + slug + '.req'
+
+    with open(os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as key_file:
+        key_file.write(key)
+    with open(request_path, 'wb') as request_file:
+        request_file.write(SimplifiedOpenvpnPki.create_request(key, slug))
+
+    return True
+
+
+def generate_client_key(options, slug):
+    """Generates client's key with selected PKI backend, safe to run in parallel."""
+    key = None
+
+    # Take pre-generated key from the pool if it's set up.
+    if options['keypool_dir']:
+        keypool = SimplifiedOpenvpnKeypool(
+            options['keypool_dir'], options['key_algo'], options['key_curve'])
+        key = keypool.take()
+        if key is None and options['keypool_policy'] == 'fail':
+            print('> Key pool is empty, refusing to generate key for "' + slug + '".')
+            return None
+
+    if options['native']:
+        if key is None:
+            key = SimplifiedOpenvpnPki.generate_private_key(
+                options['key_algo'], options['key_curve'])
+        return key
+
+    if key is not None:
+        return write_client_request(options['easy_rsa_dir'], options['easy_rsa_ver'], slug, key)
+
+    if generate_client_request(
+            options['easy_rsa_dir'], options['easy_rsa_ver'], slug,
+            options['key_algo'], options['key_curve']):
+        return True
+    return None
+
 
 class SimplifiedOpenvpn:
     """Main class that takes care of managing OpenVPN on your server."""
@@ -20,11 +86,21 @@ class SimplifiedOpenvpn:
         """Loads config if possible, else asks you to generate config."""
         self.container = _helper.sanitize_path(os.path.dirname(os.path.realpath(__file__)))
         self._config = SimplifiedOpenvpnConfig()
+        self._template = SimplifiedOpenvpnTemplate()
+        self._assets = SimplifiedOpenvpnAssets(self._config.clients_dir)
+        self._index = SimplifiedOpenvpnIndex(self._config, SimplifiedOpenvpnData())
 
         # EasyRSA 2 requires loading environment variables manually.
         if self._config.easy_rsa_ver == 2:
             self.load_env()
 
+        # Native PKI backend signs certificates in-process, Easy RSA stays as fallback.
+        self._pki = None
+        if self._config.pki_backend == 'native':
+            pki = SimplifiedOpenvpnPki(self._config)
+            if pki.is_available():
+                self._pki = pki
+
     def load_env(self):
         """Exports environment variables from vars file."""
         vars_file_path = self._config.easy_rsa_dir + 'vars'
@@ -56,12 +132,22 @@ class SimplifiedOpenvpn:
                     # Assign new enviorment variable.
                     os.environ[key] = value
 
+        # OpenSSL config of Easy RSA 2 references these, revoke-full clears them too.
+        for key in ['KEY_CN', 'KEY_OU', 'KEY_NAME', 'KEY_ALTNAMES']:
+            os.environ.setdefault(key, '')
+
     def client_exists(self, verbose=True):
         """Checks if client with generated slug already exists."""
         if os.path.isdir(self._config.clients_dir + self._config.slug):
             if verbose:
                 print('> Client with this name already exists.')
             return True
+
+        # Client's directory might be gone while its certificate is still valid.
+        if self._index.has_valid_certificate(self._config.slug):
+            if verbose:
+                print('> Client with this name still has valid certificate.')
+            return True
         return False
 
     def create_pretty_name_file(self):
@@ -72,8 +158,15 @@ class SimplifiedOpenvpn:
                 return True
         return False
 
-    def copy_client_files(self):
+    def copy_client_files(self, key=None):
         """Copies client's keys to client's directory."""
+        if self._pki:
+            with open(self._config.client_dir + self._config.slug + '.key', 'wb') as key_file:
+                key_file.write(key)
+            source = self._pki.issued_dir + self._config.slug + '.crt'
+            copyfile(source, self._config.client_dir + self._config.slug + '.crt')
+            return
+
         client_files = list()
 
         if self._config.easy_rsa_ver == 2:
@@ -97,21 +190,13 @@ class SimplifiedOpenvpn:
             os.remove(self._config.easy_rsa_dir + 'pki/private/' + self._config.slug + '.key')
             os.remove(self._config.easy_rsa_dir + 'pki/reqs/' + self._config.slug + '.req')
 
-    def copy_ca_file(self):
-        """Copies certificate authority key to client's directory."""
-        if self._config.easy_rsa_ver == 2:
-            source = self._config.easy_rsa_dir + 'keys/ca.crt'
-        else:
-            source = self._config.easy_rsa_dir + 'pki/ca.crt'
-
-        destination = self._config.client_dir + 'ca.crt'
-        copyfile(source, destination)
-
-    def copy_ta_file(self):
-        """Copies TLS Auth key to client's directory."""
-        source = self._config.server_dir + 'ta.key'
-        destination = self._config.client_dir + 'ta.key'
-        copyfile(source, destination)
+    def store_assets(self):
+        """Stores CA and TLS Auth key in shared asset store and references them from client."""
+        references = dict()
+        references['ca'] = self._assets.put(self._config.ca_path)
+        references['ta'] = self._assets.put(self._config.ta_path)
+        self._assets.write_references(self._config.client_dir, references)
+        return references
 
     def create_config(self):
         """Creates up basic config that can be changed based on flavour."""
@@ -124,75 +209,65 @@ class SimplifiedOpenvpn:
         config['inline'] = False
         return config
 
-    def write_config(self, options, flavour=''):
-        """Writes a single config file/archive for client to the disk."""
-        template = self._config.server_dir + 'client.mustache'
-        if not os.path.isfile(template):
-            print("> Template for client's config is missing, exiting.")
-            return
-
-        renderer = pystache.Renderer()
+    def load_key_material(self, references):
+        """Reads client's keys into memory once, CA and TLS Auth key come from asset store."""
         client_dir = self._config.client_dir
-        slug = self._config.slug
+        material = dict()
+        material['ca'] = self._assets.get(references['ca'])
+        material['ta'] = self._assets.get(references['ta'])
 
-        # Creates up name for config file.
-        config_path = client_dir + self._config.hostname
-        if flavour != '':
-            config_path += '-' + flavour
-        config_path += '.ovpn'
+        for name, path in [
+                ('cert', client_dir + self._config.slug + '.crt'),
+                ('key', client_dir + self._config.slug + '.key')]:
+            with open(path) as material_file:
+                material[name] = material_file.read()
 
-        with open(config_path, 'w') as config_file:
-            config_file.write(renderer.render_path(template, options))
+        return material
 
-        if not options['inline']:
-            with zipfile.ZipFile(config_path + '.zip', 'w') as config_zip:
-                config_zip.write(config_path, os.path.basename(config_path))
-                config_zip.write(client_dir + 'ca.crt', 'ca.crt')
-                config_zip.write(client_dir + slug + '.crt', slug + '.crt')
-                config_zip.write(client_dir + slug + '.key', slug + '.key')
-                config_zip.write(client_dir + 'ta.key', 'ta.key')
+    def write_config(self, content, material, flavour=''):
+        """Writes a single config file/archive for client to the disk, returns its name and hash."""
+        config_name = self._template.config_name(self._config.hostname, flavour)
 
-            # Remove config file that you just zipped but keep certificates for others.
-            os.remove(config_path)
+        if self._template.is_inline(flavour):
+            data = content.encode('utf-8')
+        else:
+            data = self._template.build_archive(
+                config_name[:-len('.zip')], content, self._config.slug, material)
+
+        # Archive only becomes visible when it's complete, so crash can't leave half of it.
+        _helper.write_file_atomically(self._config.client_dir + config_name, data)
+
+        # Inline configs are PEM text, compressed variants are stored next to them once.
+        if self._template.is_inline(flavour):
+            for encoding, suffix in _helper.content_encodings().items():
+                _helper.write_file_atomically(
+                    self._config.client_dir + config_name + suffix,
+                    _helper.compress(data, encoding))
 
-    def generate_config_files(self, verbose=True):
+        return config_name, hashlib.sha256(data).hexdigest()
+
+    def generate_config_files(self, references, verbose=True):
         """Generates different flavours of config files."""
-        ca_path = self._config.client_dir + 'ca.crt'
-        cert_path = self._config.client_dir + self._config.slug + '.crt'
-        key_path = self._config.client_dir + self._config.slug + '.key'
-        ta_path = self._config.client_dir + 'ta.key'
-        options = self.create_config()
+        template = self._config.server_dir + 'client.mustache'
+        if not os.path.isfile(template):
+            print("> Template for client's config is missing, exiting.")
+            return
+
+        material = self.load_key_material(references)
 
-        # Plain Windows flavour.
-        self.write_config(options)
-
-        # Plain Debian flavour.
-        options['deb'] = True
-        self.write_config(options, 'deb')
-        options['deb'] = False
-
-        # Plain RedHat flavour.
-        options['rhel'] = True
-        self.write_config(options, 'rhel')
-        options['rhel'] = False
-
-        # Inline Windows flavour.
-        options['inline'] = True
-        options['ca'] = _helper.read_file_as_value(ca_path)
-        options['cert'] = _helper.read_file_as_value(cert_path)
-        options['key'] = _helper.read_file_as_value(key_path)
-        options['ta'] = _helper.read_file_as_value(ta_path)
-        self.write_config(options, 'inline')
-
-        # Inline Debian flavour.
-        options['deb'] = True
-        self.write_config(options, 'inline-deb')
-        options['deb'] = False
-
-        # Inline RedHat flavour.
-        options['rhel'] = True
-        self.write_config(options, 'inline-rhel')
-        options['rhel'] = False
+        # Inline flavours embed keys, others only reference them.
+        options = self.create_config()
+        options['ca'] = material['ca'].rstrip()
+        options['cert'] = material['cert'].rstrip()
+        options['key'] = material['key'].rstrip()
+        options['ta'] = material['ta'].rstrip()
+
+        # All flavours get rendered from the same parsed template.
+        digests = dict()
+        for flavour, content in self._template.render_flavours(template, options).items():
+            config_name, digest = self.write_config(content, material, flavour)
+            digests[config_name] = digest
+        self._assets.write_digests(self._config.client_dir, digests)
 
         # Clean up.
         self.cleanup_client_certificates()
@@ -200,24 +275,24 @@ class SimplifiedOpenvpn:
         if verbose:
             print('> Client "' + self._config.slug + '" was successfully created.')
 
-    def insert_share_hash(self):
+    def insert_share_hash(self, record):
         """Inserts client's data to database."""
         sovpn_data = SimplifiedOpenvpnData()
-        sovpn_data.insert_share_hash(self._config.slug, self._config.share_hash)
+        sovpn_data.insert_share_hash(*record)
         if self._config.share_hash:
             return self._config.share_hash
 
-    def rotate_share_hashes(self):
+    def rotate_share_hashes(self, chunk_size=1000, chunked_commits=False):
         """Generates share hashes for clients who can be found in database."""
         sovpn_data = SimplifiedOpenvpnData()
-        slugs = sovpn_data.get_all_client_slugs()
-        for slug in slugs:
-            share_hash = _helper.generate_share_hash(slug, self._config.sovpn_share_salt)
-            sovpn_data.rotate_share_hash(slug, share_hash)
+        salt = self._config.sovpn_share_salt
+        return sovpn_data.rotate_share_hashes(
+            lambda slug, renewals: _helper.generate_share_hash(slug, salt, renewals),
+            chunk_size, chunked_commits)
 
     def cleanup_client_certificates(self):
         """Cleans up client's certificates as they are no longer needed."""
-        cert_files = [self._config.slug + '.crt', self._config.slug + '.key', 'ca.crt', 'ta.key']
+        cert_files = [self._config.slug + '.crt', self._config.slug + '.key']
         for cert_file in cert_files:
             os.remove(self._config.client_dir + cert_file)
 
@@ -239,6 +314,60 @@ class SimplifiedOpenvpn:
             print()
             exit(0)
 
+    def key_options(self):
+        """Returns options that are needed to generate client's key in other process."""
+        options = dict()
+        options['native'] = self._pki is not None
+        options['easy_rsa_dir'] = self._config.easy_rsa_dir
+        options['easy_rsa_ver'] = self._config.easy_rsa_ver
+        options['key_algo'] = self._config.key_algo or 'rsa'
+        options['key_curve'] = self._config.key_curve
+        options['keypool_dir'] = None
+        options['keypool_policy'] = self._config.keypool_policy
+
+        keypool = SimplifiedOpenvpnKeypool(self._config.keypool_dir)
+        if keypool.exists() and SimplifiedOpenvpnPki.is_supported():
+            options['keypool_dir'] = keypool.pool_dir
+        return options
+
+    def sign_client_request(self, slug, key=None, renew=False):
+        """Signs client's certificate request with certificate authority."""
+        if self._pki:
+            try:
+                self._pki.issue_certificate(slug, key, renew)
+            except (OSError, ValueError):
+                return False
+            return True
+
+        if self._config.easy_rsa_ver == 2:
+            cmd = './pkitool --sign ' + slug + ' 1> /dev/null'
+        else:
+            cmd = './easyrsa --batch sign-req client ' + slug + ' 1> /dev/null'
+
+        return run(cmd, shell=True, cwd=self._config.easy_rsa_dir).returncode == 0
+
+    def build_client(self, verbose=True, key=None):
+        """Creates client's directory and config files, returns client's catalogue record."""
+        self._config.client_dir = self._config.slug
+        self.create_pretty_name_file()
+        self.copy_client_files(key)
+        references = self.store_assets()
+
+        cert_serial, not_after = SimplifiedOpenvpnPki.read_certificate_info(
+            self._config.client_dir + self._config.slug + '.crt')
+        record = (
+            self._config.slug, self._config.share_hash, self._config.pretty_name,
+            cert_serial, not_after)
+
+        # In lazy mode share server renders config files on demand from client's keys.
+        if self._config.storage_mode == 'lazy':
+            if verbose:
+                print('> Client "' + self._config.slug + '" was successfully created.')
+            return record
+
+        self.generate_config_files(references, verbose)
+        return record
+
     def create_client(self, pretty_name=None):
         """Entry point for client creation process."""
         self._config.pretty_name = pretty_name
@@ -253,34 +382,314 @@ class SimplifiedOpenvpn:
             self._config.pretty_name = pretty_name
         else:
             self._config.slug = self._config.pretty_name
-            self.client_exists(True)
+            if self.client_exists(True):
+                exit(1)
 
         # Key generation.
-        if self._config.easy_rsa_ver == 2:
-            cmd = './build-key ' + self._config.slug + ' 1> /dev/null'
-        else:
-            cmd = './easyrsa build-client-full ' + self._config.slug + ' nopass 1> /dev/null'
+        key = generate_client_key(self.key_options(), self._config.slug)
+        if key is None:
+            exit(1)
 
-        run(cmd, shell=True, cwd=self._config.easy_rsa_dir)
+        if not self.sign_client_request(self._config.slug, key):
+            print('> Signing certificate of client "' + self._config.slug + '" failed, exiting.')
+            exit(1)
 
         # Config generation.
-        self._config.client_dir = self._config.slug
-        self.create_pretty_name_file()
-        self.copy_client_files()
-        self.copy_ca_file()
-        self.copy_ta_file()
-        self.generate_config_files()
+        record = self.build_client(True, key)
 
         # If generating share hash was successful then ask if to start sharing right now.
-        if self.insert_share_hash():
+        if self.insert_share_hash(record):
             self.ask_to_share()
 
+    def create_clients(self, pretty_names):
+        # pylint: disable=R0912
+        """Entry point for bulk client creation process, returns per-client report."""
+        report = list()
+        clients = dict()
+
+        for pretty_name in pretty_names:
+            self._config.slug = pretty_name
+            entry = dict()
+            entry['slug'] = self._config.slug
+            entry['pretty_name'] = pretty_name
+            entry['share_hash'] = None
+            entry['status'] = 'pending'
+
+            if entry['slug'] == '':
+                entry['status'] = 'invalid name'
+            elif entry['slug'] in clients or self.client_exists(False):
+                entry['status'] = 'already exists'
+            else:
+                clients[entry['slug']] = entry
+
+            report.append(entry)
+
+        keys = self.issue_client_certificates(clients)
+
+        records = list()
+        for slug, entry in clients.items():
+            if entry['status'] != 'pending':
+                continue
+
+            self._config.pretty_name = entry['pretty_name']
+            self._config.slug = entry['pretty_name']
+            record = self.build_client(False, keys[slug])
+            entry['share_hash'] = record[1]
+            records.append(record)
+
+        # All clients get inserted to database in single transaction.
+        sovpn_data = SimplifiedOpenvpnData()
+        results = sovpn_data.insert_share_hashes(records)
+
+        for slug, inserted in results.items():
+            clients[slug]['status'] = 'created' if inserted else 'database insert failed'
+
+        self.print_report(report)
+        self.print_render_timings()
+        return report
+
+    def issue_client_certificates(self, clients, before_signing=None, renew=False):
+        """Generates keys in parallel and signs them one by one, returns keys by slug.
+
+        before_signing gets called with slugs whose keys were generated, right before signing,
+        renew lets native backend sign while old certificate is still valid.
+        """
+        keys = dict()
+
+        # Key generation doesn't touch shared state of CA, so it can run in parallel.
+        with ProcessPoolExecutor() as executor:
+            futures = dict()
+            options = self.key_options()
+            for slug, entry in clients.items():
+                if entry['status'] == 'pending':
+                    futures[slug] = executor.submit(generate_client_key, options, slug)
+
+            for slug, future in futures.items():
+                keys[slug] = future.result()
+                if keys[slug] is None:
+                    clients[slug]['status'] = 'key generation failed'
+
+        if before_signing:
+            before_signing([slug for slug, entry in clients.items() if entry['status'] == 'pending'])
+
+        # Signing updates CA's index and serial files, so requests get signed one by one.
+        for slug, entry in clients.items():
+            if entry['status'] == 'pending' and \
+                    not self.sign_client_request(slug, keys[slug], renew):
+                entry['status'] = 'signing failed'
+
+        return keys
+
+    def renew_clients(self, slugs):
+        """Reissues certificates of clients, regenerates their config files and share hashes."""
+        report = list()
+        clients = dict()
+
+        for slug in slugs:
+            entry = dict()
+            entry['slug'] = slug
+            entry['share_hash'] = None
+            entry['status'] = 'pending'
+
+            if slug in clients:
+                entry['status'] = 'duplicate'
+            elif slug == '' or not os.path.isdir(self._config.clients_dir + slug):
+                entry['status'] = 'not found'
+            else:
+                clients[slug] = entry
+
+            report.append(entry)
+
+        # Revoked clients stay revoked.
+        valid = self._index.valid_slugs(list(clients))
+        for slug, entry in list(clients.items()):
+            if slug not in valid:
+                entry['status'] = 'no valid certificate'
+                del clients[slug]
+
+        revoked = list()
+        if self._pki:
+            # Native backend allows second valid certificate with the same name, so old ones are
+            # only revoked once new ones exist and failed renewal leaves client as it was.
+            keys = self.issue_client_certificates(clients, renew=True)
+            issued = [slug for slug, entry in clients.items() if entry['status'] == 'pending']
+            new_serials = set(
+                SimplifiedOpenvpnPki.read_certificate_info(self._pki.issued_dir + slug + '.crt')[0]
+                for slug in issued)
+            revoked = self._pki.revoke_certificates(issued, new_serials)
+        else:
+            # Easy RSA refuses second certificate with the same name, so old ones get revoked
+            # right before signing, but only for clients whose new keys were generated.
+            keys = self.issue_client_certificates(
+                clients, lambda slugs: revoked.extend(self.mark_revoked(slugs)))
+
+            for slug, entry in clients.items():
+                if entry['status'] == 'signing failed' and slug in revoked:
+                    entry['status'] = 'signing failed, old certificate revoked'
+            failed = [slug for slug in revoked if clients[slug]['status'] != 'pending']
+            if failed:
+                SimplifiedOpenvpnData().mark_clients_revoked(failed)
+
+        sovpn_data = SimplifiedOpenvpnData()
+        records = list()
+        for slug, entry in clients.items():
+            if entry['status'] != 'pending':
+                continue
+
+            pretty_name = _helper.read_file_as_value(
+                self._config.clients_dir + slug + '/pretty-name.txt')
+            self._config.pretty_name = pretty_name or slug
+            self._config.slug = slug
+
+            # Config files of old certificate are removed, hostname might have changed too.
+            for config_file in os.listdir(self._config.clients_dir + slug):
+                if config_file.endswith(
+                        ('.ovpn', '.ovpn.zip', '.ovpn.gz', '.ovpn.br', self._assets.digests_file)):
+                    os.remove(self._config.clients_dir + slug + '/' + config_file)
+
+            record = self.build_client(False, keys[slug])
+
+            # New share hash also invalidates share tokens that were signed with the old one.
+            renewals = sovpn_data.find_client_renewals(slug) + 1
+            share_hash = _helper.generate_share_hash(
+                slug, self._config.sovpn_share_salt, renewals)
+            entry['share_hash'] = share_hash
+            entry['status'] = 'renewed'
+            records.append((slug, share_hash) + record[2:] + (renewals,))
+
+        sovpn_data.renew_clients(records)
+
+        if revoked:
+            self.publish_crl(self.generate_crl())
+
+        self.print_report(report, 'renewed')
+        self.print_render_timings()
+        return report
+
+    def print_render_timings(self):
+        """Prints average render time of every flavour that was rendered."""
+        averages = self._template.average_timings()
+        if averages:
+            print('> Average render time: ' + ', '.join(
+                (flavour or 'default') + ' ' + '%.2f' % (seconds * 1000) + ' ms'
+                for flavour, seconds in averages.items()) + '.')
+
+    @staticmethod
+    def print_report(report, action='created'):
+        """Prints outcome of bulk client operation for every client."""
+        done = [entry for entry in report if entry['status'] == action]
+        print(
+            '> ' + action.capitalize() + ' ' + str(len(done)) + ' of ' +
+            str(len(report)) + ' clients.')
+
+        text_padding = max([len(entry['slug']) for entry in report] + [14])
+        for entry in report:
+            line = '> ' + entry['slug'].ljust(text_padding) + ' : ' + entry['status']
+            if entry['share_hash']:
+                line += ' (' + entry['share_hash'] + ')'
+            print(line)
+
+    @staticmethod
+    def print_catalogue(records, ndjson=False):
+        """Prints client catalogue records as table or newline delimited JSON."""
+        if ndjson:
+            for record in records:
+                print(json.dumps(record))
+            return
+
+        def format_time(timestamp):
+            if timestamp is None:
+                return '-'
+            return time.strftime('%Y-%m-%d', time.gmtime(timestamp))
+
+        # Columns are as wide as their longest value, so table is printed once all rows are read.
+        rows = [['Slug', 'Created', 'Expires', 'Revoked', 'Serial', 'Name']]
+        for record in records:
+            rows.append([
+                record['slug'], format_time(record['created_at']),
+                format_time(record['not_after']), format_time(record['revoked_at']),
+                record['cert_serial'] or '-', record['pretty_name'] or '-'])
+
+        widths = [max(len(row[index]) for row in rows) for index in range(len(rows[0]))]
+        for row in rows:
+            print('  '.join([value.ljust(width) for value, width in zip(row, widths)]).rstrip())
+
     def revoke_client(self, slug):
         """Revokes client's certificates. It only really work if your server uses CRL."""
+        return self.revoke_clients([slug])
+
+    def mark_revoked(self, slugs):
+        """Marks certificates of clients as revoked in CA's database, returns revoked slugs."""
+        if self._pki:
+            return self._pki.revoke_certificates(slugs)
+
+        # Certificate cache tells which clients have anything to revoke without calling OpenSSL.
+        valid = self._index.valid_slugs(slugs)
+
+        revoked = list()
+        for slug in slugs:
+            if slug not in valid:
+                continue
+
+            if self._config.easy_rsa_ver == 2:
+                # Same as revoke-full, but without regenerating CRL for every client.
+                cmd = 'openssl ca -revoke ' + slug + '.crt -config "$KEY_CONFIG" 1> /dev/null 2>&1'
+                cwd = self._config.easy_rsa_dir + 'keys'
+            else:
+                cmd = './easyrsa --batch revoke ' + slug + ' 1> /dev/null 2>&1'
+                cwd = self._config.easy_rsa_dir
+
+            if run(cmd, shell=True, cwd=cwd).returncode == 0:
+                revoked.append(slug)
+        return revoked
+
+    def generate_crl(self):
+        """Regenerates CRL in CA's directory and returns its path."""
+        if self._pki:
+            self._pki.generate_crl()
+            return self._pki.crl_path
+
         if self._config.easy_rsa_ver == 2:
-            cmd = './revoke-full ' + slug + ' 1> /dev/null 2>&1'
-        else:
-            cmd = 'echo yes | ./easyrsa revoke ' + slug + ' 1> /dev/null 2>&1'
+            cmd = 'openssl ca -gencrl -out crl.pem -config "$KEY_CONFIG" 1> /dev/null 2>&1'
+            run(cmd, shell=True, cwd=self._config.easy_rsa_dir + 'keys')
+            return self._config.easy_rsa_dir + 'keys/crl.pem'
+
+        run('./easyrsa --batch gen-crl 1> /dev/null 2>&1', shell=True, cwd=self._config.easy_rsa_dir)
+        return self._config.easy_rsa_dir + 'pki/crl.pem'
+
+    def publish_crl(self, crl_path):
+        """Atomically replaces CRL in server's directory, OpenVPN reads it after dropping root."""
+        with open(crl_path, 'rb') as crl_file:
+            content = crl_file.read()
+        _helper.write_file_atomically(self._config.server_dir + 'crl.pem', content, 0o644)
+
+    def revoke_clients(self, slugs):
+        """Revokes certificates of multiple clients with single CRL regeneration."""
+        timings = list()
+
+        start = time.perf_counter()
+        revoked = self.mark_revoked(slugs)
+        timings.append(('Revoke', time.perf_counter() - start))
+
+        for slug in slugs:
+            if slug in revoked:
+                print('> Revoked client with common name of: "' + slug + '".')
+            else:
+                print('> Client with common name of: "' + slug + '" has no valid certificate.')
+
+        if revoked:
+            SimplifiedOpenvpnData().mark_clients_revoked(revoked)
+
+            start = time.perf_counter()
+            crl_path = self.generate_crl()
+            timings.append(('CRL', time.perf_counter() - start))
+
+            start = time.perf_counter()
+            self.publish_crl(crl_path)
+            timings.append(('Publish', time.perf_counter() - start))
+
+        text_padding = 16
+        for phase, seconds in timings:
+            print(('> ' + phase + ' phase').ljust(text_padding) + ' : ' + '%.3fs' % seconds)
 
-        run(cmd, shell=True, cwd=self._config.easy_rsa_dir)
-        print('> Revoked client with common name of: "' + slug + '".')
+        return revoked
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""File that contains SimplifiedOpenvpnAssets class."""
+
+import os
+import json
+import hashlib
+
+from simplified_openvpn_helper import SimplifiedOpenvpnHelper as _helper
+
+
+class SimplifiedOpenvpnAssets:
+    """Class that stores files shared between clients (CA, TLS Auth key) once by their hash."""
+    references_file = '.assets.json'
+    digests_file = '.digests.json'
+
+    def __init__(self, clients_dir):
+        """Sets up path of asset store inside clients' directory."""
+        self.clients_dir = clients_dir
+        self.store_dir = clients_dir + '.assets/'
+        self._hashes = dict()
+        self._blobs = dict()
+
+    def put(self, path):
+        """Adds file to the store if it's not there yet and returns its hash."""
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._hashes.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        with open(path, 'rb') as asset_file:
+            content = asset_file.read()
+
+        digest = hashlib.sha256(content).hexdigest()
+        if not os.path.isfile(self.store_dir + digest):
+            _helper.create_directory(self.store_dir)
+            _helper.write_file_atomically(self.store_dir + digest, content)
+
+        self._hashes[path] = (mtime, digest)
+        self._blobs[digest] = content.decode('utf-8')
+        return digest
+
+    def get(self, digest):
+        """Returns content of stored file, blobs never change so they are cached forever."""
+        if digest not in self._blobs:
+            with open(self.store_dir + digest) as asset_file:
+                self._blobs[digest] = asset_file.read()
+        return self._blobs[digest]
+
+    def write_references(self, client_dir, references):
+        """Records hashes of assets that client's config files are built from."""
+        content = json.dumps(references) + "\n"
+        _helper.write_file_atomically(client_dir + self.references_file, content.encode('utf-8'))
+
+    def read_references(self, client_dir):
+        """Returns hashes of assets that client references or None."""
+        value = _helper.read_file_as_value(client_dir + self.references_file)
+        if value:
+            return json.loads(value)
+        return None
+
+    def write_digests(self, client_dir, digests):
+        """Records SHA-256 hashes of client's config files, share server uses them as ETags."""
+        content = json.dumps(digests) + "\n"
+        _helper.write_file_atomically(client_dir + self.digests_file, content.encode('utf-8'))
+
+    def read_digests(self, client_dir):
+        """Returns hashes of client's config files by name or None."""
+        value = _helper.read_file_as_value(client_dir + self.digests_file)
+        if value:
+            return json.loads(value)
+        return None
+
+    def referenced(self):
+        """Returns set of hashes that are referenced by at least one client."""
+        digests = set()
+        for slug in os.listdir(self.clients_dir):
+            client_dir = self.clients_dir + slug + '/'
+            if slug.startswith('.') or not os.path.isdir(client_dir):
+                continue
+
+            references = self.read_references(client_dir)
+            if references:
+                digests.update(references.values())
+        return digests
+
+    def gc(self, keep_paths=None, verbose=True):
+        """Removes blobs that no client references anymore, returns number of removed blobs."""
+        if not os.path.isdir(self.store_dir):
+            return 0
+
+        # Assets that are currently in use are kept even if no client references them yet.
+        referenced = self.referenced()
+        for path in keep_paths or list():
+            if os.path.isfile(path):
+                with open(path, 'rb') as asset_file:
+                    referenced.add(hashlib.sha256(asset_file.read()).hexdigest())
+
+        removed = 0
+        freed = 0
+        for digest in os.listdir(self.store_dir):
+            if digest.startswith('.') or digest in referenced:
+                continue
+
+            freed += os.path.getsize(self.store_dir + digest)
+            os.remove(self.store_dir + digest)
+            self._blobs.pop(digest, None)
+            removed += 1
+
+        if verbose:
+            print('> Removed ' + str(removed) + ' unreferenced blobs (' + str(freed) + ' bytes).')
+        return removed
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""File that contains SimplifiedOpenvpnCache class."""
+
+import threading
+from collections import OrderedDict
+
+
+class SimplifiedOpenvpnCache:
+    """Class that implements thread-safe LRU cache bounded by number of entries and bytes."""
+
+    def __init__(self, max_entries=256, max_bytes=None):
+        """Sets up empty cache with given limits."""
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Returns number of entries in cache."""
+        return len(self._entries)
+
+    @staticmethod
+    def sizeof(value):
+        """Returns size of value that counts against max_bytes."""
+        if isinstance(value, (bytes, str)):
+            return len(value)
+        if isinstance(value, tuple):
+            return sum(SimplifiedOpenvpnCache.sizeof(item) for item in value)
+        return 0
+
+    def get(self, key, default=None):
+        """Returns cached value and marks it as recently used."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """Stores value in cache and evicts least recently used entries over limits."""
+        with self._lock:
+            if key in self._entries:
+                self.size -= self.sizeof(self._entries.pop(key))
+
+            self._entries[key] = value
+            self.size += self.sizeof(value)
+
+            while self._entries and (
+                    len(self._entries) > self.max_entries or
+                    (self.max_bytes is not None and self.size > self.max_bytes)):
+                _, evicted = self._entries.popitem(False)
+                self.size -= self.sizeof(evicted)
+
+        return value
+
+    def discard(self, key):
+        """Removes single entry from cache."""
+        with self._lock:
+            if key in self._entries:
+                self.size -= self.sizeof(self._entries.pop(key))
+
+    def clear(self):
+        """Removes all entries from cache."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    @property
+    def hit_ratio(self):
+        """Returns ratio of lookups that were served from cache."""
+        total = self.hits + self.misses
+        if total == 0:
+            return 0.0
+        return self.hits / total
@@ -22,7 +22,12 @@ class SimplifiedOpenvpnConfig:
     settings['server']['server_dir'] = None
     settings['server']['easy_rsa_dir'] = None
     settings['server']['easy_rsa_ver'] = None
+    settings['server']['pki_backend'] = None
+    settings['server']['key_algo'] = None
+    settings['server']['key_curve'] = None
+    settings['server']['keypool_policy'] = None
     settings['server']['clients_dir'] = None
+    settings['server']['storage_mode'] = None
     settings['server']['hostname'] = None
     settings['server']['ipv4'] = None
     settings['server']['protocol'] = None
@@ -34,6 +39,7 @@ class SimplifiedOpenvpnConfig:
     settings['server']['sovpn_share_address'] = None
     settings['server']['sovpn_share_port'] = None
     settings['server']['sovpn_share_url'] = None
+    settings['server']['sovpn_share_limits'] = None
     settings['server']['sovpn_config_file'] = None
     settings['server']['needs_rotation'] = None
 
@@ -117,6 +123,69 @@ class SimplifiedOpenvpnConfig:
 
         config['server']['easy_rsa_ver'] = self.easy_rsa_ver
 
+        # Ask value for pki_backend property.
+        suggestion_source = self.sovpn_config_file if self.loaded else None
+        suggestion = self.get_suggestion('pki_backend', suggestion_source)
+
+        while self.pki_backend is None:
+            prompt = _prompt.get('pki_backend', suggestion)
+            pki_backend = input(prompt)
+            if pki_backend.strip() == '':
+                pki_backend = suggestion
+            self.pki_backend = pki_backend
+
+        config['server']['pki_backend'] = self.pki_backend
+
+        # Ask value for key_algo property.
+        suggestion_source = self.sovpn_config_file if self.loaded else None
+        suggestion = self.get_suggestion('key_algo', suggestion_source)
+
+        while self.key_algo is None:
+            prompt = _prompt.get('key_algo', suggestion)
+            key_algo = input(prompt)
+            if key_algo.strip() == '':
+                key_algo = suggestion
+            self.key_algo = key_algo
+
+            # Easy RSA 2 only knows how to generate RSA keys.
+            if self.easy_rsa_ver == 2 and self.pki_backend != 'native' and self.key_algo != 'rsa':
+                print('> Easy RSA 2 only supports RSA keys, use native PKI backend for others.')
+                self.key_algo = None
+
+        config['server']['key_algo'] = self.key_algo
+
+        # Ask value for key_curve property, RSA keys don't use curves.
+        if self.key_algo != 'rsa':
+            suggestion_source = self.sovpn_config_file if self.loaded else None
+            suggestion = self.get_suggestion('key_curve', suggestion_source)
+
+            if suggestion not in self.key_curves[self.key_algo]:
+                suggestion = self.key_curves[self.key_algo][0]
+
+            while self.key_curve is None:
+                prompt = _prompt.get('key_curve', suggestion)
+                key_curve = input(prompt)
+                if key_curve.strip() == '':
+                    key_curve = suggestion
+                self.key_curve = key_curve
+        else:
+            self.key_curve = None
+
+        config['server']['key_curve'] = self.key_curve
+
+        # Ask value for keypool_policy property.
+        suggestion_source = self.sovpn_config_file if self.loaded else None
+        suggestion = self.get_suggestion('keypool_policy', suggestion_source)
+
+        while self.keypool_policy is None:
+            prompt = _prompt.get('keypool_policy', suggestion)
+            keypool_policy = input(prompt)
+            if keypool_policy.strip() == '':
+                keypool_policy = suggestion
+            self.keypool_policy = keypool_policy
+
+        config['server']['keypool_policy'] = self.keypool_policy
+
         # Ask value for clients_dir property.
         suggestion_source = self.sovpn_config_file if self.loaded else None
         suggestion = self.get_suggestion('clients_dir', suggestion_source)
@@ -130,6 +199,19 @@ class SimplifiedOpenvpnConfig:
 
         config['server']['clients_dir'] = self.clients_dir
 
+        # Ask value for storage_mode property.
+        suggestion_source = self.sovpn_config_file if self.loaded else None
+        suggestion = self.get_suggestion('storage_mode', suggestion_source)
+
+        while self.storage_mode is None:
+            prompt = _prompt.get('storage_mode', suggestion)
+            storage_mode = input(prompt)
+            if storage_mode.strip() == '':
+                storage_mode = suggestion
+            self.storage_mode = storage_mode
+
+        config['server']['storage_mode'] = self.storage_mode
+
         # Ask value for hostname property.
         suggestion_source = self.sovpn_config_file if self.loaded else None
         suggestion = self.get_suggestion('hostname', suggestion_source)
@@ -300,6 +382,10 @@ class SimplifiedOpenvpnConfig:
                 self.sovpn_share_url = 'http://' + ipv4 + ':' + str(self.sovpn_share_port) + '/'
                 config['server']['sovpn_share_url'] = self.sovpn_share_url
 
+        # Limits of share server are not asked, but edited ones are kept.
+        if self.settings['server']['sovpn_share_limits'] is not None:
+            config['server']['sovpn_share_limits'] = self.settings['server']['sovpn_share_limits']
+
         # Ask value for sovpn_config_file property.
         suggestion = self.server_dir + 'sovpn.json'
 
@@ -327,6 +413,7 @@ class SimplifiedOpenvpnConfig:
         properties.remove('easy_rsa_dir')
         properties.remove('easy_rsa_ver')
         properties.remove('sovpn_share_url')
+        properties.remove('sovpn_share_limits')
         properties.remove('sovpn_config_file')
 
         for current_property in properties:
@@ -348,6 +435,23 @@ class SimplifiedOpenvpnConfig:
                         setattr(self, key, value)
         self.loaded = True
 
+    def reload(self):
+        """Returns new config loaded from config file, current config stays as it is."""
+        config = SimplifiedOpenvpnConfig.__new__(SimplifiedOpenvpnConfig)
+        config.container = self.container
+        config.override = self.override
+        config.loaded = False
+        config.needs_rotation = False
+
+        # Settings are shared by all instances, so new config gets its own empty copy of them.
+        config.settings = dict()
+        for pool, values in self.settings.items():
+            config.settings[pool] = dict.fromkeys(values)
+
+        config.sovpn_config_file = self.sovpn_config_file
+        config.load()
+        return config
+
     @staticmethod
     def get_suggestion(key, sample_path=None):
         """Gets suggestions from _suggest class if possible."""
@@ -456,6 +560,89 @@ class SimplifiedOpenvpnConfig:
         if version in [2, 3]:
             self.settings['server']['easy_rsa_ver'] = version
 
+    @property
+    def pki_backend(self):
+        """Returns backend that is used for issuing certificates."""
+        return self.settings['server']['pki_backend']
+
+    @pki_backend.setter
+    def pki_backend(self, value):
+        """Assigns new value to pki_backend property."""
+        if value is None:
+            self.settings['server']['pki_backend'] = None
+            return
+
+        backends = ['easyrsa', 'native']
+
+        if isinstance(value, str) and value.strip().lower() in backends:
+            self.settings['server']['pki_backend'] = value.strip().lower()
+
+    @property
+    def key_curves(self):
+        """Returns curves that are supported by each key algorithm."""
+        curves = dict()
+        curves['rsa'] = list()
+        curves['ec'] = ['prime256v1', 'secp384r1', 'secp521r1']
+        curves['ed'] = ['ed25519', 'ed448']
+        return curves
+
+    @property
+    def key_algo(self):
+        """Returns algorithm that is used for client keys."""
+        return self.settings['server']['key_algo']
+
+    @key_algo.setter
+    def key_algo(self, value):
+        """Assigns new value to key_algo property."""
+        if value is None:
+            self.settings['server']['key_algo'] = None
+            return
+
+        if isinstance(value, str) and value.strip().lower() in self.key_curves:
+            self.settings['server']['key_algo'] = value.strip().lower()
+
+    @property
+    def key_curve(self):
+        """Returns curve that is used for EC and ED client keys."""
+        return self.settings['server']['key_curve']
+
+    @key_curve.setter
+    def key_curve(self, value):
+        """Assigns new value to key_curve property if it matches key algorithm."""
+        if value is None:
+            self.settings['server']['key_curve'] = None
+            return
+
+        curves = self.key_curves.get(self.key_algo, list())
+
+        if isinstance(value, str) and value.strip().lower() in curves:
+            self.settings['server']['key_curve'] = value.strip().lower()
+
+    @property
+    def keypool_policy(self):
+        """Returns what happens when key pool runs out of keys."""
+        return self.settings['server']['keypool_policy']
+
+    @keypool_policy.setter
+    def keypool_policy(self, value):
+        """Assigns new value to keypool_policy property."""
+        if value is None:
+            self.settings['server']['keypool_policy'] = None
+            return
+
+        policies = ['inline', 'fail']
+
+        if isinstance(value, str) and value.strip().lower() in policies:
+            self.settings['server']['keypool_policy'] = value.strip().lower()
+
+    @property
+    def keypool_dir(self):
+        """Returns path of directory that holds pre-generated keys for current key algorithm."""
+        pool = self.key_algo or 'rsa'
+        if self.key_curve:
+            pool += '-' + self.key_curve
+        return self.server_dir + 'keypool/' + pool + '/'
+
     @property
     def clients_dir(self):
         """Returns path of directory that contains files for all users."""
@@ -482,6 +669,35 @@ class SimplifiedOpenvpnConfig:
 
         self.settings['server']['clients_dir'] = _helper.sanitize_path(value)
 
+    @property
+    def storage_mode(self):
+        """Returns whether config files are generated on creation or rendered on demand."""
+        return self.settings['server']['storage_mode']
+
+    @storage_mode.setter
+    def storage_mode(self, value):
+        """Assigns new value to storage_mode property."""
+        if value is None:
+            self.settings['server']['storage_mode'] = None
+            return
+
+        modes = ['eager', 'lazy']
+
+        if isinstance(value, str) and value.strip().lower() in modes:
+            self.settings['server']['storage_mode'] = value.strip().lower()
+
+    @property
+    def ca_path(self):
+        """Returns path of certificate authority's certificate."""
+        if self.easy_rsa_ver == 2:
+            return self.easy_rsa_dir + 'keys/ca.crt'
+        return self.easy_rsa_dir + 'pki/ca.crt'
+
+    @property
+    def ta_path(self):
+        """Returns path of server's TLS Auth key."""
+        return self.server_dir + 'ta.key'
+
     @property
     def hostname(self):
         """Returns value of hostname property."""
@@ -646,6 +862,34 @@ class SimplifiedOpenvpnConfig:
             value += '/'
         self.settings['server']['sovpn_share_url'] = value
 
+    @property
+    def sovpn_share_limits(self):
+        """Returns limits of share server, ones that are not configured get default values."""
+        limits = dict()
+        limits['rate'] = 10
+        limits['burst'] = 40
+        limits['max_addresses'] = 65536
+        limits['max_requests'] = 32
+        limits['negative_entries'] = 65536
+        limits['retry_after'] = 1
+
+        if self.settings['server']['sovpn_share_limits']:
+            limits.update(self.settings['server']['sovpn_share_limits'])
+        return limits
+
+    @sovpn_share_limits.setter
+    def sovpn_share_limits(self, value):
+        """Assigns new value to sovpn_share_limits property, keeps known non-negative limits."""
+        if not isinstance(value, dict):
+            self.settings['server']['sovpn_share_limits'] = None
+            return
+
+        limits = dict()
+        for key, limit in value.items():
+            if key in self.sovpn_share_limits and isinstance(limit, (int, float)) and limit >= 0:
+                limits[key] = limit
+        self.settings['server']['sovpn_share_limits'] = limits
+
     @property
     def pretty_name(self):
         """Returns value of pretty_name property."""
@@ -3,49 +3,389 @@
 
 """File that contains SimplifiedOpenvpnData class."""
 
+import os
+import time
+import queue
 import sqlite3
+import urllib.parse
+from contextlib import contextmanager
 from simplified_openvpn_helper import SimplifiedOpenvpnHelper as _helper
 from simplified_openvpn_config import SimplifiedOpenvpnConfig
 
 class SimplifiedOpenvpnData:
     """Class that contains methods that deal with database."""
-    def __init__(self):
-        """Method that sets up connection to database."""
-        self._config = SimplifiedOpenvpnConfig()
-        self._db = sqlite3.connect(self._config.container + 'sovpn.sqlite')
+    statements = None
+    initialized = set()
+    busy_timeout = 5000
+    pool_size = 8
 
-        sql = self.read_sql_file('create_table_clients.sql')
-        self._db.cursor().execute(sql)
-        self._db.commit()
+    def __init__(self, config=None, database=None, read_only=False):
+        """Method that sets up database, connections are opened lazily and kept in pool."""
+        self._config = config if config else SimplifiedOpenvpnConfig()
+        if database is None:
+            database = self._config.container + 'sovpn.sqlite'
+
+        self.database = database
+        self.read_only = read_only
+        self._pool = queue.Queue(self.pool_size)
+
+        # Schema only needs to be created and migrated once per process.
+        if database not in SimplifiedOpenvpnData.initialized:
+            if read_only:
+                # Readers never change schema, database has to be migrated by other commands.
+                try:
+                    connection = self.connect(True)
+                    version = connection.execute('PRAGMA user_version').fetchone()[0]
+                except sqlite3.Error:
+                    print('> Database "' + database + '" can\'t be opened, exiting.')
+                    exit(1)
+
+                migrations = self.load_migrations(self._config.container)
+                if migrations and version < migrations[-1][0]:
+                    print('> Database "' + database + '" is outdated, run sovpn.py list to ' +
+                          'migrate it, exiting.')
+                    exit(1)
+            else:
+                connection = self.connect(False)
+                connection.cursor().execute(self.read_sql_file('create_table_clients.sql'))
+                connection.commit()
+                self.migrate(connection)
+
+            self.validate_statements(connection)
+            connection.close()
+            SimplifiedOpenvpnData.initialized.add(database)
+
+    def connect(self, read_only=None, check_same_thread=True):
+        """Opens new tuned connection to database."""
+        if read_only is None:
+            read_only = self.read_only
+
+        if read_only:
+            connection = sqlite3.connect(
+                'file:' + urllib.parse.quote(self.database) + '?mode=ro', uri=True,
+                check_same_thread=check_same_thread)
+        else:
+            connection = sqlite3.connect(self.database, check_same_thread=check_same_thread)
+            # WAL lets readers keep reading while other process writes.
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+
+        connection.execute('PRAGMA busy_timeout=' + str(self.busy_timeout))
+        return connection
+
+    @contextmanager
+    def connection(self):
+        """Lends connection from pool, opens new one when all pooled connections are in use.
+
+        Threads of share server come and go with requests, so connections are kept by pool
+        instead of thread. Connections over pool size are closed once they are returned.
+        """
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            connection = self.connect(check_same_thread=False)
+
+        try:
+            yield connection
+        except BaseException:
+            connection.rollback()
+            raise
+        finally:
+            try:
+                self._pool.put_nowait(connection)
+            except queue.Full:
+                connection.close()
+
+    def close(self):
+        """Closes pooled connections, SQLite connections must not be used across fork."""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    @staticmethod
+    def load_statements(container):
+        """Loads and validates all SQL files once, files in local/sql/ override bundled ones."""
+        statements = dict()
+
+        for sql_dir in [container + 'sql/', container + 'local/sql/']:
+            if not os.path.isdir(sql_dir):
+                continue
+
+            for sql_file in sorted(os.listdir(sql_dir)):
+                if not sql_file.endswith('.sql'):
+                    continue
+
+                sql = _helper.read_file_as_value(sql_dir + sql_file)
+                if not sql or not sqlite3.complete_statement(sql + ';'):
+                    print('> SQL file "' + sql_dir + sql_file + '" is invalid, exiting.')
+                    exit(1)
+
+                statements[sql_file] = sql
+
+        SimplifiedOpenvpnData.statements = statements
+        return statements
+
+    @staticmethod
+    def load_migrations(container):
+        """Returns list of (version, statements) from sql/migrations/ ordered by version."""
+        migrations = list()
+        migrations_dir = container + 'sql/migrations/'
+
+        for sql_file in sorted(os.listdir(migrations_dir)):
+            if not sql_file.endswith('.sql'):
+                continue
+
+            statements = list()
+            statement = ''
+            for line in _helper.read_file_as_value(migrations_dir + sql_file).splitlines():
+                statement += line + "\n"
+                if sqlite3.complete_statement(statement):
+                    statements.append(statement.strip())
+                    statement = ''
+
+            if statement.strip():
+                print('> Migration "' + sql_file + '" is invalid, exiting.')
+                exit(1)
+
+            migrations.append((int(sql_file.split('_')[0]), statements))
+        return migrations
+
+    def migrate(self, connection):
+        """Applies migrations that are newer than database's user_version, each in transaction."""
+        connection.isolation_level = None
+
+        for version, statements in self.load_migrations(self._config.container):
+            # Version is checked again after lock is taken as other process might have migrated.
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                if connection.execute('PRAGMA user_version').fetchone()[0] >= version:
+                    connection.execute('ROLLBACK')
+                    continue
+
+                for statement in statements:
+                    connection.execute(statement)
+                connection.execute('PRAGMA user_version = ' + str(version))
+                connection.execute('COMMIT')
+            except sqlite3.Error:
+                connection.execute('ROLLBACK')
+                raise
+
+    def validate_statements(self, connection):
+        """Prepares every statement against migrated schema, so broken SQL fails at start."""
+        if SimplifiedOpenvpnData.statements is None:
+            self.load_statements(self._config.container)
+
+        for sql_file, sql in SimplifiedOpenvpnData.statements.items():
+            # EXPLAIN compiles statement without running it, parameters only need right count.
+            try:
+                connection.execute('EXPLAIN ' + sql, [None] * sql.count('?')).fetchall()
+            except sqlite3.Error as error:
+                print('> SQL file "' + sql_file + '" is invalid (' + str(error) + '), exiting.')
+                exit(1)
 
     def read_sql_file(self, sql_file):
-        """Reads sql from file and returns it."""
-        sql = _helper.read_file_as_value(self._config.container + 'sql/' + sql_file)
-        return sql
+        """Returns sql from statement registry, same string lets sqlite3 reuse prepared statement."""
+        statements = SimplifiedOpenvpnData.statements
+        if statements is None:
+            statements = self.load_statements(self._config.container)
+        return statements[sql_file]
 
-    def insert_share_hash(self, slug, share_hash):
+    def insert_share_hash(self, slug, share_hash, pretty_name=None, cert_serial=None, not_after=None):
         """Inserts new client record to clients table."""
         sql = self.read_sql_file('insert_client_record.sql')
+        created_at = int(time.time())
 
-        try:
-            self._db.cursor().execute(sql, [slug, share_hash])
-            self._db.commit()
-            return True
-        except:
-            return None
+        with self.connection() as db:
+            try:
+                db.cursor().execute(
+                    sql, [slug, share_hash, pretty_name, created_at, cert_serial, not_after])
+                db.commit()
+                return True
+            except:
+                return None
+
+    def insert_share_hashes(self, records):
+        """Inserts multiple client records to clients table in single transaction.
+
+        Records are tuples of slug, share hash and optionally pretty name, cert serial
+        and expiry timestamp.
+        """
+        sql = self.read_sql_file('insert_client_record.sql')
+        created_at = int(time.time())
+        results = dict()
+
+        with self.connection() as db:
+            cursor = db.cursor()
+            for record in records:
+                slug, share_hash, pretty_name, cert_serial, not_after = \
+                    tuple(record) + (None,) * (5 - len(record))
+                try:
+                    cursor.execute(
+                        sql, [slug, share_hash, pretty_name, created_at, cert_serial, not_after])
+                    results[slug] = True
+                except sqlite3.IntegrityError:
+                    results[slug] = False
+
+            db.commit()
+        return results
+
+    def mark_clients_revoked(self, slugs):
+        """Records revocation time of clients in single transaction."""
+        sql = self.read_sql_file('update_client_revoked.sql')
+        revoked_at = int(time.time())
+        with self.connection() as db:
+            db.cursor().executemany(sql, ((revoked_at, slug) for slug in slugs))
+            db.commit()
+
+    def list_clients(self, revoked=None, expiring_within=None, created_within=None):
+        """Yields client catalogue records as dicts, filters are answered from indexes."""
+        sql = self.read_sql_file('select_client_catalogue.sql')
+        conditions = list()
+        parameters = list()
+        now = int(time.time())
+
+        if revoked is True:
+            conditions.append('revoked_at IS NOT NULL')
+        elif revoked is False:
+            conditions.append('revoked_at IS NULL')
+
+        if expiring_within is not None:
+            conditions.append('not_after < ?')
+            parameters.append(now + expiring_within)
+
+        if created_within is not None:
+            conditions.append('created_at >= ?')
+            parameters.append(now - created_within)
+
+        if conditions:
+            sql += "\nWHERE " + ' AND '.join(conditions)
+        sql += "\nORDER BY slug"
+
+        columns = ['slug', 'pretty_name', 'created_at', 'cert_serial', 'not_after', 'revoked_at']
+        with self.connection() as db:
+            for row in db.cursor().execute(sql, parameters):
+                yield dict(zip(columns, row))
+
+    def renew_clients(self, records):
+        """Stores new share hashes, certificate metadata and renewal counts of renewed clients."""
+        sql = self.read_sql_file('update_client_renewed.sql')
+        with self.connection() as db:
+            db.cursor().executemany(
+                sql, ((share_hash, cert_serial, not_after, renewals, slug)
+                      for slug, share_hash, _, cert_serial, not_after, renewals in records))
+            db.commit()
+
+    def find_client_renewals(self, slug):
+        """Returns how many times client's certificate has been renewed."""
+        sql = self.read_sql_file('find_client_renewals_by_slug.sql')
+        with self.connection() as db:
+            result = db.cursor().execute(sql, [slug]).fetchone()
+        if result:
+            return result[0]
+        return 0
+
+    def read_index_state(self, path):
+        """Returns inode, offset and last parsed line of index file or None."""
+        sql = self.read_sql_file('select_index_state.sql')
+        with self.connection() as db:
+            return db.cursor().execute(sql, [path]).fetchone()
+
+    def store_certificates(self, path, state, records, reset=False):
+        """Stores parsed certificate records and parser's state in single transaction."""
+        with self.connection() as db:
+            cursor = db.cursor()
+            if reset:
+                cursor.execute(self.read_sql_file('delete_certificates.sql'))
+
+            cursor.executemany(self.read_sql_file('replace_certificate.sql'), records)
+
+            # Catalogue of clients gets filled from index too, so older clients have metadata.
+            # Easy RSA only marks expired certificates when asked to, so expiry time is checked too.
+            now = int(time.time())
+            cursor.executemany(
+                self.read_sql_file('update_client_certificate.sql'),
+                ((serial, not_after, slug, not_after)
+                 for serial, slug, status, not_after, _ in records
+                 if status == 'V' and not_after is not None and not_after > now))
+            cursor.executemany(
+                self.read_sql_file('update_client_revoked_by_serial.sql'),
+                ((revoked_at, slug, serial)
+                 for serial, slug, status, _, revoked_at in records if status == 'R'))
+
+            cursor.execute(self.read_sql_file('replace_index_state.sql'), [path] + list(state))
+            db.commit()
+
+    def find_valid_certificate_slugs(self, slugs):
+        """Returns set of given slugs that have unexpired valid certificate in certificate cache."""
+        sql = self.read_sql_file('find_valid_certificate_by_slug.sql')
+        now = int(time.time())
+        valid = set()
+        with self.connection() as db:
+            cursor = db.cursor()
+            for slug in slugs:
+                if cursor.execute(sql, [slug, now]).fetchone():
+                    valid.add(slug)
+        return valid
 
     def rotate_share_hash(self, slug, share_hash):
         """Updates existing client record in clients table."""
         sql = self.read_sql_file('update_client_hash.sql')
-        self._db.cursor().execute(sql, [share_hash, slug])
-        self._db.commit()
+        with self.connection() as db:
+            db.cursor().execute(sql, [share_hash, slug])
+            db.commit()
+
+    def rotate_share_hashes(self, generate, chunk_size=1000, chunked_commits=False, verbose=True):
+        """Updates hashes of all clients in single transaction, reading clients page by page."""
+        select_sql = self.read_sql_file('select_client_slugs_page.sql')
+        update_sql = self.read_sql_file('update_client_hash_by_id.sql')
+        total = self.count_clients()
+        rotated = 0
+        last_id = 0
+
+        with self.connection() as db:
+            cursor = db.cursor()
+            while True:
+                cursor.execute(select_sql, [last_id, chunk_size])
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+
+                last_id = rows[-1][0]
+                cursor.executemany(
+                    update_sql,
+                    ((generate(slug, renewals), row_id) for row_id, slug, renewals in rows))
+                rotated += len(rows)
+
+                if chunked_commits:
+                    db.commit()
+
+                if verbose:
+                    print("\r> Rotated " + str(rotated) + ' of ' + str(total) + ' share hashes.',
+                          end='', flush=True)
+
+            db.commit()
+
+        if verbose:
+            print()
+        return rotated
+
+    def count_clients(self):
+        """Returns number of clients in database."""
+        sql = self.read_sql_file('count_clients.sql')
+        with self.connection() as db:
+            cursor = db.cursor()
+            cursor.execute(sql)
+            return cursor.fetchone()[0]
 
     def find_client_slug_by_share_hash(self, share_hash):
         """Returns slug that is fetched by share's hash."""
         sql = self.read_sql_file('find_client_slug_by_hash.sql')
-        cursor = self._db.cursor()
-        cursor.execute(sql, [share_hash])
-        result = cursor.fetchone()
+        with self.connection() as db:
+            cursor = db.cursor()
+            cursor.execute(sql, [share_hash])
+            result = cursor.fetchone()
         if result:
             return result[0]
         return None
@@ -53,9 +393,10 @@ class SimplifiedOpenvpnData:
     def find_client_share_hash_by_slug(self, slug):
         """Returns share's hash that is fetched by slug."""
         sql = self.read_sql_file('find_client_hash_by_slug.sql')
-        cursor = self._db.cursor()
-        cursor.execute(sql, [slug])
-        result = cursor.fetchone()
+        with self.connection() as db:
+            cursor = db.cursor()
+            cursor.execute(sql, [slug])
+            result = cursor.fetchone()
         if result:
             return result[0]
         return None
@@ -63,9 +404,10 @@ class SimplifiedOpenvpnData:
     def get_all_client_slugs(self):
         """Returns list that contains client slugs."""
         sql = self.read_sql_file('select_client_slugs.sql')
-        cursor = self._db.cursor()
-        cursor.execute(sql)
-        result = cursor.fetchall()
+        with self.connection() as db:
+            cursor = db.cursor()
+            cursor.execute(sql)
+            result = cursor.fetchall()
 
         slugs = list()
         for record in result:
@@ -5,11 +5,22 @@
 """File that contains SimplifiedOpenvpnHelper class."""
 
 import os
+import sys
+import csv
+import gzip
+import hmac
+import time
+import base64
 import socket
 import inspect
 import hashlib
 from requests import get
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 
 class SimplifiedOpenvpnHelper:
     """Class that contains shareable helper methods."""
@@ -32,6 +43,46 @@ class SimplifiedOpenvpnHelper:
             value = content.read().rstrip()
         return value
 
+    @staticmethod
+    def read_names_from_csv(filename):
+        """Reads client names from first column of CSV file or from stdin if filename is dash."""
+        names = list()
+
+        if filename == '-':
+            rows = csv.reader(sys.stdin)
+            names = [row[0].strip() for row in rows if row and row[0].strip()]
+        elif os.path.isfile(filename):
+            with open(filename, newline='') as csv_file:
+                rows = csv.reader(csv_file)
+                names = [row[0].strip() for row in rows if row and row[0].strip()]
+        else:
+            print("> File that you tried to read names from doesn't exist.")
+            return None
+
+        return names
+
+    @staticmethod
+    def write_file_atomically(filename, content, mode=0o600):
+        """Writes bytes to hidden temporary file next to target and renames it over target."""
+        directory, name = os.path.split(filename)
+        temp_path = os.path.join(directory, '.' + name + '.tmp')
+
+        descriptor = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+        with os.fdopen(descriptor, 'wb') as temp_file:
+            temp_file.write(content)
+            # Content has to reach disk before rename does, or crash could leave empty file.
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+
+        os.replace(temp_path, filename)
+
+        # Rename itself is only durable once directory entry is synced too.
+        descriptor = os.open(directory or '.', os.O_RDONLY)
+        try:
+            os.fsync(descriptor)
+        finally:
+            os.close(descriptor)
+
     @staticmethod
     def create_directory(value, mode=0o700):
         """Creates new directory on filesystem."""
@@ -87,8 +138,70 @@ class SimplifiedOpenvpnHelper:
         return None
 
     @staticmethod
-    def generate_share_hash(slug, sovpn_share_salt=''):
+    def generate_share_hash(slug, sovpn_share_salt='', renewals=0):
         """Calculates and return SOVPN share hash for specified slug."""
-        feed = (sovpn_share_salt + slug).encode('utf-8')
+        feed = sovpn_share_salt + slug
+        # Every renewal gives client new hash, so rotation never brings back the old one.
+        if renewals:
+            feed += ':' + str(renewals)
+        feed = feed.encode('utf-8')
         share_hash = hashlib.sha1(feed).hexdigest()
         return share_hash
+
+    @staticmethod
+    def content_encodings():
+        """Returns content encodings that can be produced with file suffixes, preferred first."""
+        encodings = dict()
+        if brotli is not None:
+            encodings['br'] = '.br'
+        encodings['gzip'] = '.gz'
+        return encodings
+
+    @staticmethod
+    def compress(data, encoding):
+        """Compresses data with given content encoding, output doesn't depend on time."""
+        if encoding == 'br':
+            return brotli.compress(data, quality=11)
+        return gzip.compress(data, 9, mtime=0)
+
+    @staticmethod
+    def parse_duration(value):
+        """Returns number of seconds in duration such as 30d, 12h or 2w, plain number is days."""
+        units = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60, 'w': 7 * 24 * 60 * 60}
+        value = str(value).strip().lower()
+
+        if value.isdigit():
+            return int(value) * units['d']
+        if len(value) > 1 and value[:-1].isdigit() and value[-1] in units:
+            return int(value[:-1]) * units[value[-1]]
+        return None
+
+    @staticmethod
+    def sign_share_token(payload, sovpn_share_salt):
+        """Returns URL safe HMAC signature of share token's payload."""
+        digest = hmac.new(
+            sovpn_share_salt.encode('utf-8'), payload.encode('utf-8'), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest[:18]).decode('ascii')
+
+    @staticmethod
+    def generate_share_token(slug, sovpn_share_salt, ttl):
+        """Generates stateless share token that contains slug, expiry time and signature."""
+        payload = slug + '.' + str(int(time.time()) + int(ttl))
+        return payload + '.' + SimplifiedOpenvpnHelper.sign_share_token(payload, sovpn_share_salt)
+
+    @staticmethod
+    def verify_share_token(token, sovpn_share_salt):
+        """Returns slug from valid and unexpired share token, else None."""
+        parts = token.split('.')
+        if len(parts) != 3 or not parts[1].isdigit():
+            return None
+
+        payload = parts[0] + '.' + parts[1]
+        signature = SimplifiedOpenvpnHelper.sign_share_token(payload, sovpn_share_salt)
+
+        # Constant time comparison doesn't leak how much of the signature was right.
+        if not hmac.compare_digest(signature, parts[2]):
+            return None
+        if int(parts[1]) < time.time():
+            return None
+        return parts[0]
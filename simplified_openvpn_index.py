@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""File that contains SimplifiedOpenvpnIndex class."""
+
+import os
+import calendar
+
+from simplified_openvpn_pki import SimplifiedOpenvpnPki
+
+
+class SimplifiedOpenvpnIndex:
+    """Class that incrementally parses Easy RSA's index.txt into certificate cache of database."""
+
+    def __init__(self, config, data):
+        """Sets up path of index.txt based on Easy RSA's version."""
+        self._config = config
+        self._data = data
+
+        if self._config.easy_rsa_ver == 2:
+            self.index_path = self._config.easy_rsa_dir + 'keys/index.txt'
+        else:
+            self.index_path = self._config.easy_rsa_dir + 'pki/index.txt'
+
+    @staticmethod
+    def parse_time(value):
+        """Returns Unix timestamp of index.txt's time value or None if it's empty."""
+        if not value:
+            return None
+        return calendar.timegm(SimplifiedOpenvpnPki.parse_index_time(value).timetuple())
+
+    @staticmethod
+    def parse_line(line):
+        """Returns certificate record (serial, slug, status, not_after, revoked_at) or None."""
+        fields = line.split("\t")
+        if len(fields) < 6:
+            return None
+
+        slug = None
+        for part in fields[5].split('/'):
+            if part.startswith('CN='):
+                slug = part[len('CN='):]
+
+        if slug is None:
+            return None
+
+        not_after = SimplifiedOpenvpnIndex.parse_time(fields[1])
+        revoked_at = SimplifiedOpenvpnIndex.parse_time(fields[2])
+        return (fields[3], slug, fields[0], not_after, revoked_at)
+
+    def refresh(self):
+        """Reads lines appended since last run, whole file if it was replaced or rewritten."""
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return 0
+
+        state = self._data.read_index_state(self.index_path)
+        offset = 0
+        last_line = b''
+
+        if state:
+            inode, offset, last_line = state
+            # Nothing was written since last run.
+            if inode == stat.st_ino and offset == stat.st_size:
+                return 0
+
+        with open(self.index_path, 'rb') as index_file:
+            # OpenSSL replaces index.txt on every change, even same length edits of statuses,
+            # so only file with the same inode can have just appended lines. Those are checked
+            # by finding last parsed line where it was, anything else means full reparse.
+            reset = not state or inode != stat.st_ino or offset == 0 or offset > stat.st_size
+            if not reset:
+                index_file.seek(offset - len(last_line))
+                reset = index_file.read(len(last_line)) != last_line
+
+            if reset:
+                offset = 0
+                last_line = b''
+                index_file.seek(0)
+
+            content = index_file.read()
+
+        # Line that is still being written gets parsed on next run.
+        end = content.rfind(b"\n") + 1
+        records = list()
+        for line in content[:end].decode('utf-8').splitlines():
+            record = self.parse_line(line)
+            if record:
+                records.append(record)
+
+        if end:
+            last_line = content[content.rfind(b"\n", 0, end - 1) + 1:end]
+        offset += end
+
+        self._data.store_certificates(
+            self.index_path, (stat.st_ino, offset, last_line), records, reset)
+        return len(records)
+
+    def valid_slugs(self, slugs):
+        """Returns set of given slugs that have valid certificate."""
+        self.refresh()
+        return self._data.find_valid_certificate_slugs(slugs)
+
+    def has_valid_certificate(self, slug):
+        """Checks if client has valid certificate."""
+        return slug in self.valid_slugs([slug])
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""File that contains SimplifiedOpenvpnKeypool class."""
+
+import os
+import json
+import time
+import fcntl
+from concurrent.futures import ProcessPoolExecutor
+
+from simplified_openvpn_helper import SimplifiedOpenvpnHelper as _helper
+from simplified_openvpn_pki import SimplifiedOpenvpnPki
+
+
+class SimplifiedOpenvpnKeypool:
+    """Class that keeps directory of pre-generated private keys for client creation."""
+
+    def __init__(self, pool_dir, key_algo='rsa', key_curve=None):
+        """Sets up paths of key pool, pool directory itself gets created on first fill."""
+        self.pool_dir = pool_dir
+        self.key_algo = key_algo
+        self.key_curve = key_curve
+        self.stats_path = pool_dir + 'stats.json'
+        self.lock_path = pool_dir + '.lock'
+
+    def exists(self):
+        """Checks if key pool has been set up."""
+        return os.path.isdir(self.pool_dir)
+
+    def lock(self):
+        """Acquires exclusive lock for key pool and returns lock file."""
+        lock_file = open(self.lock_path, 'w')
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def keys(self):
+        """Returns list of key files that are currently in the pool."""
+        if not self.exists():
+            return list()
+        return sorted([name for name in os.listdir(self.pool_dir) if name.endswith('.key')])
+
+    @property
+    def depth(self):
+        """Returns number of keys in the pool."""
+        return len(self.keys())
+
+    def read_stats(self):
+        """Returns hit and miss counters of the pool."""
+        stats = dict()
+        stats['hits'] = 0
+        stats['misses'] = 0
+
+        value = _helper.read_file_as_value(self.stats_path)
+        if value:
+            stats.update(json.loads(value))
+        return stats
+
+    def record(self, hit):
+        """Increments hit or miss counter, needs to be called while pool is locked."""
+        stats = self.read_stats()
+        stats['hits' if hit else 'misses'] += 1
+        with open(self.stats_path, 'w') as stats_file:
+            stats_file.write(json.dumps(stats) + "\n")
+
+    def take(self):
+        """Takes one key out of the pool and returns it as PEM, returns None if pool is empty."""
+        if not self.exists():
+            return None
+
+        lock_file = self.lock()
+        try:
+            keys = self.keys()
+            if not keys:
+                self.record(False)
+                return None
+
+            key_path = self.pool_dir + keys[0]
+            with open(key_path, 'rb') as key_file:
+                key = key_file.read()
+            os.remove(key_path)
+            self.record(True)
+        finally:
+            lock_file.close()
+
+        return key
+
+    def put(self, key):
+        """Adds generated key to the pool."""
+        name = os.urandom(8).hex() + '.key'
+        temp_path = self.pool_dir + '.' + name
+        descriptor = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(descriptor, 'wb') as key_file:
+            key_file.write(key)
+
+        # Key becomes visible for others only when it's fully written.
+        os.rename(temp_path, self.pool_dir + name)
+
+    def fill(self, count, verbose=True):
+        """Generates keys in parallel until pool contains given number of keys."""
+        if not SimplifiedOpenvpnPki.is_supported():
+            print('> Key pool requires python3-cryptography.')
+            exit(1)
+
+        _helper.create_directory(self.pool_dir)
+        missing = count - self.depth
+
+        if missing > 0:
+            with ProcessPoolExecutor() as executor:
+                futures = [
+                    executor.submit(
+                        SimplifiedOpenvpnPki.generate_private_key, self.key_algo, self.key_curve)
+                    for _ in range(missing)
+                ]
+
+                for future in futures:
+                    self.put(future.result())
+
+        if verbose:
+            self.print_status()
+
+    def work(self, count, interval=10):
+        """Keeps pool filled up to given number of keys until interrupted."""
+        try:
+            while True:
+                self.fill(count, False)
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print()
+
+    def print_status(self):
+        """Prints depth and hit rate of the pool."""
+        stats = self.read_stats()
+        total = stats['hits'] + stats['misses']
+        hit_rate = stats['hits'] / total * 100 if total else 0.0
+        text_padding = 14
+
+        print('> Pool depth'.ljust(text_padding) + ' : ' + str(self.depth))
+        print('> Pool hits'.ljust(text_padding) + ' : ' + str(stats['hits']))
+        print('> Pool misses'.ljust(text_padding) + ' : ' + str(stats['misses']))
+        print('> Hit rate'.ljust(text_padding) + ' : ' + '%.1f%%' % hit_rate)
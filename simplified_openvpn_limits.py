@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""File that contains SimplifiedOpenvpnLimits class."""
+
+import time
+import threading
+from collections import OrderedDict
+from simplified_openvpn_cache import SimplifiedOpenvpnCache
+
+
+class SimplifiedOpenvpnLimitedResponse:
+    """Response iterable that holds request slot until server closes it after last byte."""
+
+    def __init__(self, result, release):
+        """Wraps result of application, release gets called once response is closed."""
+        self._result = result
+        self._release = release
+
+        # Server looks for file of file wrapper to send it with sendfile.
+        filelike = getattr(result, 'filelike', None)
+        if filelike is not None:
+            self.filelike = filelike
+
+    def __iter__(self):
+        """Yields chunks of wrapped response."""
+        return iter(self._result)
+
+    def close(self):
+        """Closes wrapped response and releases its request slot."""
+        try:
+            if hasattr(self._result, 'close'):
+                self._result.close()
+        finally:
+            if self._release:
+                self._release()
+                self._release = None
+
+
+class SimplifiedOpenvpnLimits:
+    """WSGI middleware that sheds load of share server before it reaches application."""
+
+    def __init__(self, app, rate=10, burst=40, max_addresses=65536, max_requests=32,
+                 negative_entries=65536, retry_after=1):
+        """Sets up limits, zero disables rate limit, request cap or negative cache."""
+        self.app = app
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_addresses = max(max_addresses, 1)
+        self.max_requests = max_requests
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.limited = 0
+        self.shed = 0
+
+        # Token buckets of addresses as [tokens, updated], least recently seen get dropped first.
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_requests) if max_requests else None
+
+        self.unknown = SimplifiedOpenvpnCache(negative_entries) if negative_entries else None
+        self._generation = None
+
+    def allow(self, address):
+        """Takes token from bucket of address, returns False if bucket is empty."""
+        if not self.rate:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(address)
+            if bucket is None:
+                bucket = [self.burst, now]
+                self._buckets[address] = bucket
+                if len(self._buckets) > self.max_addresses:
+                    self._buckets.popitem(False)
+            else:
+                self._buckets.move_to_end(address)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            if bucket[0] < 1:
+                return False
+
+            bucket[0] -= 1
+            return True
+
+    def reject(self, start_response, status):
+        """Answers request without calling application."""
+        body = (status + "\n").encode('ascii')
+        start_response(status, [
+            ('Content-Type', 'text/plain'),
+            ('Content-Length', str(len(body))),
+            ('Retry-After', str(self.retry_after)),
+            ('Cache-Control', 'no-store')])
+        return [body]
+
+    def __call__(self, environ, start_response):
+        """Calls application if address is within its rate and there is free request slot."""
+        if not self.allow(environ.get('REMOTE_ADDR')):
+            self.limited += 1
+            return self.reject(start_response, '429 Too Many Requests')
+
+        # Requests over cap are answered right away instead of queueing behind slow ones.
+        if self._slots is not None and not self._slots.acquire(False):
+            self.shed += 1
+            return self.reject(start_response, '503 Service Unavailable')
+
+        with self._lock:
+            self.in_flight += 1
+        try:
+            result = self.app(environ, start_response)
+        except BaseException:
+            self.release()
+            raise
+
+        # Streamed and sendfile responses are sent after application returns, so slot is held
+        # until server closes response.
+        return SimplifiedOpenvpnLimitedResponse(result, self.release)
+
+    def release(self):
+        """Frees request slot of finished response."""
+        with self._lock:
+            self.in_flight -= 1
+        if self._slots is not None:
+            self._slots.release()
+
+    def is_unknown(self, share_hash, generation):
+        """Checks if share hash was unknown since lookup index was last rebuilt."""
+        if self.unknown is None:
+            return False
+
+        # Rebuilt index might know hashes that were unknown before.
+        if generation != self._generation:
+            self.unknown.clear()
+            self._generation = generation
+        return self.unknown.get(share_hash) is not None
+
+    def remember_unknown(self, share_hash, generation):
+        """Records share hash that didn't resolve to any client."""
+        if self.unknown is not None and generation == self._generation:
+            self.unknown.put(share_hash, True)
+
+    def stats(self):
+        """Returns configured limits and counters of rejected requests."""
+        stats = dict()
+        stats['rate'] = self.rate
+        stats['burst'] = self.burst
+        stats['max_requests'] = self.max_requests
+        stats['in_flight'] = self.in_flight
+        stats['addresses'] = len(self._buckets)
+        stats['limited'] = self.limited
+        stats['shed'] = self.shed
+        stats['negative_entries'] = len(self.unknown) if self.unknown is not None else 0
+        stats['negative_hits'] = self.unknown.hits if self.unknown is not None else 0
+        return stats
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""File that contains SimplifiedOpenvpnLookup class."""
+
+import sys
+import time
+import threading
+
+
+class SimplifiedOpenvpnLookup:
+    """Class that keeps in-memory index of share hashes and refreshes it when database changes."""
+
+    def __init__(self, data, refresh_interval=1.0):
+        """Builds index from database, changes are checked at most once per refresh interval."""
+        self._data = data
+        self._connection = data.connect(True, False)
+        self._lock = threading.Lock()
+        self._index = dict()
+        self._hashes = dict()
+        self._data_version = None
+        self._changed = 0
+        self._checked = 0.0
+        self.refresh_interval = refresh_interval
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self._memory_size = None
+        self.refresh(True)
+
+    def close(self):
+        """Closes connection, SQLite connections must not be used across fork."""
+        self._connection.close()
+
+    def reconnect(self):
+        """Opens new connection and rebuilds index, used by forked share workers."""
+        self._connection = self._data.connect(True, False)
+        self.refresh(True)
+
+    def data_version(self):
+        """Returns SQLite's data version that changes whenever other connection commits."""
+        return self._connection.execute('PRAGMA data_version').fetchone()[0]
+
+    def refresh(self, force=False):
+        """Updates index with clients that changed since last check, rebuilds it if forced."""
+        now = time.monotonic()
+        if not force and now - self._checked < self.refresh_interval:
+            return False
+
+        with self._lock:
+            self._checked = now
+            data_version = self.data_version()
+            if not force and data_version == self._data_version:
+                return False
+
+            if force:
+                sql = self._data.read_sql_file('select_client_hashes.sql')
+                rows = self._connection.execute(sql).fetchall()
+                index = dict((share_hash, slug) for share_hash, slug, _ in rows)
+                hashes = dict((slug, share_hash) for share_hash, slug, _ in rows)
+
+                # New index is built aside and swapped in one assignment, so readers never see half.
+                self._index, self._hashes = index, hashes
+                self._changed = max([changed for _, _, changed in rows] + [0])
+                self.rebuilds += 1
+            else:
+                # Triggers number every inserted or rehashed client, so only those get read.
+                sql = self._data.read_sql_file('select_changed_client_hashes.sql')
+                rows = self._connection.execute(sql, [self._changed]).fetchall()
+                for share_hash, slug, changed in rows:
+                    previous = self._hashes.get(slug)
+                    self._index[share_hash] = slug
+                    self._hashes[slug] = share_hash
+                    if previous is not None and previous != share_hash:
+                        self._index.pop(previous, None)
+                    self._changed = changed
+                if rows:
+                    self.rebuilds += 1
+
+            self._data_version = data_version
+        return True
+
+    def find_slug(self, share_hash):
+        """Returns slug that belongs to share hash or None."""
+        self.refresh()
+        slug = self._index.get(share_hash)
+        if slug is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return slug
+
+    def find_share_hash(self, slug):
+        """Returns current share hash of client or None."""
+        self.refresh()
+        return self._hashes.get(slug)
+
+    @property
+    def memory_size(self):
+        """Returns approximate memory used by index in bytes, measured again only after change."""
+        if self._memory_size is not None and self._memory_size[0] == self.rebuilds:
+            return self._memory_size[1]
+
+        index = self._index
+        # Reverse index shares strings with forward one.
+        size = sys.getsizeof(index) + sys.getsizeof(self._hashes)
+        for share_hash, slug in index.items():
+            size += sys.getsizeof(share_hash) + sys.getsizeof(slug)
+        self._memory_size = (self.rebuilds, size)
+        return size
+
+    def stats(self):
+        """Returns counters of index."""
+        stats = dict()
+        stats['entries'] = len(self._index)
+        stats['hits'] = self.hits
+        stats['misses'] = self.misses
+        stats['rebuilds'] = self.rebuilds
+        stats['memory_size'] = self.memory_size
+        return stats
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""File that contains SimplifiedOpenvpnMetrics class."""
+
+import json
+import mmap
+import time
+import queue
+import socket
+import struct
+import bisect
+import threading
+from contextlib import contextmanager
+from simplified_openvpn_server import SimplifiedOpenvpnWSGIServer
+from simplified_openvpn_template import SimplifiedOpenvpnTemplate
+
+
+class SimplifiedOpenvpnMetrics:
+    """WSGI middleware that measures share server in memory that is shared with forked workers."""
+    routes = ['page', 'config', 'bundle', 'other']
+    statuses = ['200', '206', '304', '403', '404', '416', '429', '500', '503', 'other']
+    phases = ['db', 'listdir', 'render']
+    flavours = [flavour or 'default' for flavour in SimplifiedOpenvpnTemplate.flavours]
+    buckets = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+    collect_interval = 1.0
+    log_size = 10000
+
+    def __init__(self, app, collect=None, info=None, slots=1, access_log=None):
+        """Sets up counters for given number of processes.
+
+        Values returned by collect() are counters of single process that get copied to shared
+        memory at most once per collect interval, info holds values that are the same for all
+        processes.
+        """
+        self.app = app
+        self.collect = collect if collect else dict
+        self.info = info if info else dict()
+        self.access_log = access_log
+        self.keys = dict()
+
+        for route in self.routes:
+            for status in self.statuses:
+                self.add_key(('requests', route, status))
+            self.add_key(('bytes', route))
+            self.add_histogram(('request', route))
+
+        for phase in self.phases:
+            self.add_histogram(('phase', phase))
+        for flavour in self.flavours:
+            self.add_histogram(('flavour', flavour))
+
+        self.add_key(('log_dropped',))
+        for name in self.collect():
+            self.add_key(('collected', name))
+
+        # Anonymous shared mapping survives fork, so every worker writes to its own slot of it.
+        self._slot_size = len(self.keys) * 8
+        self._slots = slots
+        self._memory = mmap.mmap(-1, self._slot_size * slots)
+        self._offset = 0
+        self._lock = threading.Lock()
+        self._collected = 0.0
+        self._log = None
+        self._writer = None
+
+    def add_key(self, key):
+        """Reserves place for value in every slot."""
+        self.keys[key] = len(self.keys) * 8
+
+    def add_histogram(self, name):
+        """Reserves places for buckets, sum and count of histogram."""
+        for index in range(len(self.buckets)):
+            self.add_key(name + ('bucket', index))
+        self.add_key(name + ('sum',))
+        self.add_key(name + ('count',))
+
+    def use(self, slot):
+        """Selects slot of current process and starts its access log writer, called after fork."""
+        self._offset = slot * self._slot_size
+        self._lock = threading.Lock()
+
+        if self.access_log:
+            self._log = queue.Queue(self.log_size)
+            self._writer = threading.Thread(target=self.write_log, daemon=True)
+            self._writer.start()
+
+    def add(self, key, value=1):
+        """Adds value to counter of current process."""
+        offset = self._offset + self.keys[key]
+        with self._lock:
+            struct.pack_into(
+                'd', self._memory, offset, struct.unpack_from('d', self._memory, offset)[0] + value)
+
+    def observe(self, name, seconds):
+        """Records duration in histogram of current process."""
+        index = bisect.bisect_left(self.buckets, seconds)
+        if index < len(self.buckets):
+            self.add(name + ('bucket', index))
+        self.add(name + ('sum',), seconds)
+        self.add(name + ('count',))
+
+    @contextmanager
+    def time(self, phase):
+        """Measures duration of phase of request."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(('phase', phase), time.perf_counter() - start)
+
+    def value(self, key):
+        """Returns sum of value over all processes."""
+        offset = self.keys[key]
+        return sum(
+            struct.unpack_from('d', self._memory, slot * self._slot_size + offset)[0]
+            for slot in range(self._slots))
+
+    def store_collected(self):
+        """Copies counters of current process to its slot, at most once per collect interval."""
+        now = time.monotonic()
+        if now - self._collected < self.collect_interval:
+            return
+
+        self._collected = now
+        for name, value in self.collect().items():
+            key = ('collected', name)
+            if key in self.keys:
+                struct.pack_into('d', self._memory, self._offset + self.keys[key], value)
+
+    @staticmethod
+    def route(path):
+        """Returns route that path belongs to without asking application."""
+        parts = path.strip('/').split('/')
+        if len(parts) == 1 and parts[0]:
+            return 'page'
+        if len(parts) == 2 and parts[1] == 'bundle.zip':
+            return 'bundle'
+        if len(parts) == 2 and parts[1]:
+            return 'config'
+        return 'other'
+
+    def record(self, environ, route, status, sent, start):
+        """Records finished request and queues its access log entry."""
+        duration = time.perf_counter() - start
+        if status not in self.statuses:
+            status = 'other'
+
+        self.add(('requests', route, status))
+        self.add(('bytes', route), sent)
+        self.observe(('request', route), duration)
+        self.store_collected()
+
+        if self._log is not None:
+            entry = dict()
+            entry['time'] = round(time.time(), 3)
+            entry['address'] = environ.get('REMOTE_ADDR')
+            entry['method'] = environ.get('REQUEST_METHOD')
+            entry['route'] = route
+            # Share hashes grant access, so only their prefix gets logged.
+            entry['hash'] = environ.get('PATH_INFO', '').strip('/').split('/')[0][:8]
+            entry['status'] = status
+            entry['bytes'] = sent
+            entry['duration'] = round(duration, 6)
+            try:
+                self._log.put_nowait(entry)
+            except queue.Full:
+                self.add(('log_dropped',))
+
+    def __call__(self, environ, start_response):
+        """Calls application and records its response."""
+        start = time.perf_counter()
+        response = dict()
+
+        def start_recorded_response(status, headers, exc_info=None):
+            """Remembers status and length of response."""
+            response['status'] = status[:3]
+            response['length'] = None
+            for name, value in headers:
+                if name.lower() == 'content-length':
+                    response['length'] = int(value)
+            return start_response(status, headers, exc_info)
+
+        result = self.app(environ, start_recorded_response)
+        route = self.route(environ.get('PATH_INFO', ''))
+
+        # Length is known for most responses, so their body is left alone for sendfile.
+        if environ.get('REQUEST_METHOD') == 'HEAD':
+            self.record(environ, route, response.get('status'), 0, start)
+            return result
+        if response.get('length') is not None:
+            self.record(environ, route, response['status'], response['length'], start)
+            return result
+        return self.count_streamed(environ, route, response, result, start)
+
+    def count_streamed(self, environ, route, response, result, start):
+        """Yields chunks of streamed response and records it once it's sent."""
+        sent = 0
+        try:
+            for chunk in result:
+                sent += len(chunk)
+                yield chunk
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+            self.record(environ, route, response.get('status'), sent, start)
+
+    def write_log(self):
+        """Writes queued access log entries as JSON lines until None gets queued."""
+        with open(self.access_log, 'a') as access_log:
+            while True:
+                entries = [self._log.get()]
+                while not self._log.empty() and len(entries) < 1000:
+                    entries.append(self._log.get_nowait())
+
+                access_log.write(
+                    ''.join(json.dumps(entry) + "\n" for entry in entries if entry is not None))
+                access_log.flush()
+                if None in entries:
+                    return
+
+    def close(self):
+        """Writes access log entries that are still queued, called before process exits."""
+        if self._writer is not None:
+            self._log.put(None)
+            self._writer.join()
+            self._writer = None
+
+    def render(self):
+        # pylint: disable=R0914
+        """Returns metrics of all processes in Prometheus text format."""
+        lines = list()
+
+        lines.append('# HELP sovpn_share_requests_total Requests by route and status.')
+        lines.append('# TYPE sovpn_share_requests_total counter')
+        for route in self.routes:
+            for status in self.statuses:
+                value = self.value(('requests', route, status))
+                if value:
+                    lines.append(
+                        'sovpn_share_requests_total{route="' + route + '",status="' + status +
+                        '"} ' + self.format_value(value))
+
+        lines.append('# HELP sovpn_share_response_bytes_total Bytes of response bodies by route.')
+        lines.append('# TYPE sovpn_share_response_bytes_total counter')
+        for route in self.routes:
+            lines.append(
+                'sovpn_share_response_bytes_total{route="' + route + '"} ' +
+                self.format_value(self.value(('bytes', route))))
+
+        lines.append('# HELP sovpn_share_request_duration_seconds Time spent handling requests.')
+        lines.append('# TYPE sovpn_share_request_duration_seconds histogram')
+        for route in self.routes:
+            lines += self.render_histogram(
+                'sovpn_share_request_duration_seconds', 'route', route, ('request', route))
+
+        lines.append(
+            '# HELP sovpn_share_phase_duration_seconds Time spent in share hash lookup (db), '
+            'listing client directories (listdir) and rendering (render).')
+        lines.append('# TYPE sovpn_share_phase_duration_seconds histogram')
+        for phase in self.phases:
+            lines += self.render_histogram(
+                'sovpn_share_phase_duration_seconds', 'phase', phase, ('phase', phase))
+
+        lines.append(
+            '# HELP sovpn_share_flavour_render_duration_seconds Time spent rendering single '
+            'flavour of config file.')
+        lines.append('# TYPE sovpn_share_flavour_render_duration_seconds histogram')
+        for flavour in self.flavours:
+            lines += self.render_histogram(
+                'sovpn_share_flavour_render_duration_seconds', 'flavour', flavour,
+                ('flavour', flavour))
+
+        lines.append('# HELP sovpn_share_access_log_dropped_total Entries dropped by full queue.')
+        lines.append('# TYPE sovpn_share_access_log_dropped_total counter')
+        lines.append(
+            'sovpn_share_access_log_dropped_total ' +
+            self.format_value(self.value(('log_dropped',))))
+
+        families = list()
+        values = dict()
+        for key in self.keys:
+            if key[0] != 'collected':
+                continue
+            values[key[1]] = self.value(key)
+            family = key[1].split('{')[0]
+            if family not in families:
+                families.append(family)
+
+        for family in families:
+            kind = 'counter' if family.endswith('_total') else 'gauge'
+            lines.append('# TYPE ' + family + ' ' + kind)
+            for name, value in values.items():
+                if name.split('{')[0] == family:
+                    lines.append(name + ' ' + self.format_value(value))
+
+        # Ratios are computed from sums, ratios of single processes can't be added up.
+        lines.append('# TYPE sovpn_share_cache_hit_ratio gauge')
+        for name, hits in values.items():
+            if not name.startswith('sovpn_share_cache_hits_total{'):
+                continue
+            labels = name[len('sovpn_share_cache_hits_total'):]
+            total = hits + values.get('sovpn_share_cache_misses_total' + labels, 0)
+            ratio = hits / total if total else 0.0
+            lines.append('sovpn_share_cache_hit_ratio' + labels + ' ' + self.format_value(ratio))
+
+        lines.append('# TYPE sovpn_share_limit gauge')
+        for name, value in self.info.items():
+            lines.append('sovpn_share_limit{name="' + name + '"} ' + self.format_value(value))
+
+        return "\n".join(lines) + "\n"
+
+    def render_histogram(self, family, label, label_value, name):
+        """Returns lines of single histogram with cumulative buckets."""
+        lines = list()
+        labels = label + '="' + label_value + '"'
+        cumulative = 0
+        for index, bound in enumerate(self.buckets):
+            cumulative += self.value(name + ('bucket', index))
+            lines.append(
+                family + '_bucket{' + labels + ',le="' + str(bound) + '"} ' +
+                self.format_value(cumulative))
+
+        count = self.value(name + ('count',))
+        lines.append(family + '_bucket{' + labels + ',le="+Inf"} ' + self.format_value(count))
+        lines.append(
+            family + '_sum{' + labels + '} ' + self.format_value(self.value(name + ('sum',))))
+        lines.append(family + '_count{' + labels + '} ' + self.format_value(count))
+        return lines
+
+    @staticmethod
+    def format_value(value):
+        """Returns value as integer if it has no fraction."""
+        if float(value).is_integer():
+            return str(int(value))
+        return repr(float(value))
+
+    def expose(self, environ, start_response):
+        """WSGI application that answers /metrics of metrics listener."""
+        if environ.get('PATH_INFO') != '/metrics':
+            start_response('404 Not Found', [('Content-Type', 'text/plain')])
+            return [b'Not Found']
+
+        body = self.render().encode('utf-8')
+        start_response('200 OK', [
+            ('Content-Type', 'text/plain; version=0.0.4; charset=utf-8'),
+            ('Content-Length', str(len(body))),
+            ('Cache-Control', 'no-store')])
+        return [body]
+
+    def serve(self, host, port):
+        """Serves /metrics from background thread of current process."""
+        family = socket.AF_INET6 if ':' in host else socket.AF_INET
+        sock = socket.create_server((host, port), family=family)
+        server = SimplifiedOpenvpnWSGIServer(sock, self.expose, 4, 5)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
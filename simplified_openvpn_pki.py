@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""File that contains SimplifiedOpenvpnPki class."""
+
+import os
+import fcntl
+import datetime
+
+try:
+    from cryptography import x509
+    from cryptography.x509.oid import NameOID
+    from cryptography.x509.oid import ExtendedKeyUsageOID
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.hazmat.primitives.asymmetric import ed25519
+    from cryptography.hazmat.primitives.asymmetric import ed448
+except ImportError:
+    x509 = None
+
+
+class SimplifiedOpenvpnPki:
+    """Class that issues and revokes client certificates in-process using Easy RSA's CA."""
+
+    def __init__(self, config):
+        """Sets up paths to Easy RSA's files based on its version."""
+        self._config = config
+        self._ca_cert = None
+        self._ca_key = None
+        self._serials = set()
+        self._valid = dict()
+        self._serials_state = None
+
+        if self._config.easy_rsa_ver == 2:
+            self.pki_dir = self._config.easy_rsa_dir + 'keys/'
+            self.ca_key_path = self.pki_dir + 'ca.key'
+            self.issued_dir = self.pki_dir
+            self.certs_by_serial_dir = self.pki_dir
+            self.cert_expire_days = int(os.environ.get('KEY_EXPIRE', 3650))
+            self.crl_days = int(os.environ.get('EASYRSA_CRL_DAYS', 30))
+        else:
+            self.pki_dir = self._config.easy_rsa_dir + 'pki/'
+            self.ca_key_path = self.pki_dir + 'private/ca.key'
+            self.issued_dir = self.pki_dir + 'issued/'
+            self.certs_by_serial_dir = self.pki_dir + 'certs_by_serial/'
+            self.cert_expire_days = int(os.environ.get('EASYRSA_CERT_EXPIRE', 825))
+            self.crl_days = int(os.environ.get('EASYRSA_CRL_DAYS', 180))
+
+        self.ca_cert_path = self.pki_dir + 'ca.crt'
+        self.index_path = self.pki_dir + 'index.txt'
+        self.serial_path = self.pki_dir + 'serial'
+        self.crl_path = self.pki_dir + 'crl.pem'
+
+    @staticmethod
+    def is_supported():
+        """Checks if cryptography package is installed."""
+        return x509 is not None
+
+    def is_available(self, verbose=True):
+        """Checks if native backend can be used with current CA."""
+        if not self.is_supported():
+            if verbose:
+                print('> Native PKI backend requires python3-cryptography, using Easy RSA.')
+            return False
+
+        try:
+            self.load_ca()
+        except (OSError, TypeError, ValueError):
+            if verbose:
+                print("> Can't load CA without passphrase for native PKI backend, using Easy RSA.")
+            return False
+
+        return True
+
+    def load_ca(self):
+        """Loads certificate and private key of certificate authority."""
+        if self._ca_cert is None:
+            with open(self.ca_cert_path, 'rb') as ca_cert_file:
+                self._ca_cert = x509.load_pem_x509_certificate(
+                    ca_cert_file.read(), default_backend())
+
+            with open(self.ca_key_path, 'rb') as ca_key_file:
+                self._ca_key = serialization.load_pem_private_key(
+                    ca_key_file.read(), None, default_backend())
+
+        return self._ca_cert, self._ca_key
+
+    @staticmethod
+    def generate_private_key(key_algo='rsa', key_curve=None):
+        """Generates new private key for client and returns it as PEM, safe to run in parallel."""
+        if key_algo == 'ec':
+            curves = dict()
+            curves['prime256v1'] = ec.SECP256R1
+            curves['secp384r1'] = ec.SECP384R1
+            curves['secp521r1'] = ec.SECP521R1
+            key = ec.generate_private_key(curves[key_curve](), default_backend())
+        elif key_algo == 'ed' and key_curve == 'ed448':
+            key = ed448.Ed448PrivateKey.generate()
+        elif key_algo == 'ed':
+            key = ed25519.Ed25519PrivateKey.generate()
+        else:
+            key = rsa.generate_private_key(65537, 2048, default_backend())
+
+        return key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption())
+
+    @staticmethod
+    def load_private_key(key_pem):
+        """Loads client's private key, skipping expensive RSA checks for keys we generated."""
+        try:
+            return serialization.load_pem_private_key(
+                key_pem, None, default_backend(), unsafe_skip_rsa_key_validation=True)
+        except TypeError:
+            return serialization.load_pem_private_key(key_pem, None, default_backend())
+
+    @staticmethod
+    def read_certificate_info(cert_path):
+        """Returns serial number and expiry timestamp of certificate, Nones if it can't be read."""
+        if x509 is None or not os.path.isfile(cert_path):
+            return None, None
+
+        with open(cert_path, 'rb') as cert_file:
+            cert = x509.load_pem_x509_certificate(cert_file.read(), default_backend())
+
+        not_after = getattr(cert, 'not_valid_after_utc', None)
+        if not_after is None:
+            not_after = cert.not_valid_after.replace(tzinfo=datetime.timezone.utc)
+
+        return SimplifiedOpenvpnPki.format_serial(cert.serial_number), int(not_after.timestamp())
+
+    @staticmethod
+    def create_request(key_pem, slug):
+        """Creates certificate request for existing private key and returns it as PEM."""
+        key = SimplifiedOpenvpnPki.load_private_key(key_pem)
+        builder = x509.CertificateSigningRequestBuilder()
+        builder = builder.subject_name(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, slug)]))
+        request = builder.sign(key, SimplifiedOpenvpnPki.signature_hash(key), default_backend())
+        return request.public_bytes(serialization.Encoding.PEM)
+
+    @staticmethod
+    def signature_hash(key):
+        """Returns hash algorithm for signing with given key, EdDSA keys don't take one."""
+        if isinstance(key, (ed25519.Ed25519PrivateKey, ed448.Ed448PrivateKey)):
+            return None
+        return hashes.SHA256()
+
+    @staticmethod
+    def format_index_time(value):
+        """Formats datetime the same way as OpenSSL does in index.txt."""
+        if value.year < 2050:
+            return value.strftime('%y%m%d%H%M%SZ')
+        return value.strftime('%Y%m%d%H%M%SZ')
+
+    @staticmethod
+    def parse_index_time(value):
+        """Parses datetime from index.txt's UTCTime or GeneralizedTime value."""
+        value = value.split(',')[0]
+        if len(value) == 13:
+            return datetime.datetime.strptime(value, '%y%m%d%H%M%SZ')
+        return datetime.datetime.strptime(value, '%Y%m%d%H%M%SZ')
+
+    def read_index(self):
+        """Returns list of records from Easy RSA's index.txt."""
+        records = list()
+        if not os.path.isfile(self.index_path):
+            return records
+
+        with open(self.index_path) as index_file:
+            for line in index_file:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) < 6:
+                    continue
+                records.append(fields)
+        return records
+
+    def write_index(self, records):
+        """Rewrites Easy RSA's index.txt with given records."""
+        temp_path = self.index_path + '.tmp'
+        with open(temp_path, 'w') as index_file:
+            for fields in records:
+                index_file.write("\t".join(fields) + "\n")
+        os.replace(temp_path, self.index_path)
+
+    def lock(self):
+        """Acquires exclusive lock for CA's database and returns lock file."""
+        lock_file = open(self.index_path + '.lock', 'w')
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def read_serials(self):
+        """Returns serials used in index.txt, only lines appended since last call get parsed.
+
+        Expiry times of valid certificates are kept by common name along the way.
+        """
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            self._serials, self._valid, self._serials_state = set(), dict(), None
+            return self._serials
+
+        # Status only changes when index gets rewritten, rewritten index has new inode and is
+        # read again from its start.
+        if self._serials_state is None or self._serials_state[0] != stat.st_ino or \
+                self._serials_state[1] > stat.st_size:
+            self._serials, self._valid = set(), dict()
+            self._serials_state = (stat.st_ino, 0)
+
+        offset = self._serials_state[1]
+        with open(self.index_path, 'rb') as index_file:
+            index_file.seek(offset)
+            content = index_file.read()
+
+        # Line that is still being written is left for next call.
+        content = content[:content.rfind(b"\n") + 1]
+        for line in content.decode('utf-8').splitlines():
+            fields = line.split("\t")
+            if len(fields) < 6:
+                continue
+
+            self._serials.add(int(fields[3], 16))
+            if fields[0] == 'V':
+                not_after = self.parse_index_time(fields[1])
+                for part in fields[5].split('/'):
+                    if part.startswith('CN='):
+                        name = part[len('CN='):]
+                        self._valid[name] = max(not_after, self._valid.get(name, not_after))
+
+        self._serials_state = (stat.st_ino, offset + len(content))
+        return self._serials
+
+    def has_valid_certificate(self, slug, now):
+        """Checks if index.txt has unexpired valid certificate for common name."""
+        self.read_serials()
+        not_after = self._valid.get(slug)
+        return not_after is not None and not_after > now.replace(tzinfo=None)
+
+    def next_serial(self):
+        """Returns random serial number that is not used in index.txt yet."""
+        used = self.read_serials()
+        serial = x509.random_serial_number()
+        while serial in used:
+            serial = x509.random_serial_number()
+        return serial
+
+    @staticmethod
+    def format_serial(serial):
+        """Formats serial number as even length uppercase hex like OpenSSL does."""
+        value = '%X' % serial
+        if len(value) % 2:
+            value = '0' + value
+        return value
+
+    def issue_certificate(self, slug, key_pem, renew=False):
+        """Signs certificate for client's key and records it in Easy RSA's database.
+
+        Like Easy RSA, it refuses second valid certificate with the same name unless it renews.
+        """
+        ca_cert, ca_key = self.load_ca()
+        key = self.load_private_key(key_pem)
+        now = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+        not_after = now + datetime.timedelta(days=self.cert_expire_days)
+        subject = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, slug)])
+
+        lock_file = self.lock()
+        try:
+            if not renew and self.has_valid_certificate(slug, now):
+                raise ValueError('Valid certificate for "' + slug + '" already exists.')
+            serial = self.next_serial()
+
+            builder = x509.CertificateBuilder()
+            builder = builder.subject_name(subject)
+            builder = builder.issuer_name(ca_cert.subject)
+            builder = builder.public_key(key.public_key())
+            builder = builder.serial_number(serial)
+            builder = builder.not_valid_before(now)
+            builder = builder.not_valid_after(not_after)
+            builder = builder.add_extension(x509.BasicConstraints(False, None), True)
+            builder = builder.add_extension(
+                x509.SubjectKeyIdentifier.from_public_key(key.public_key()), False)
+            builder = builder.add_extension(
+                x509.AuthorityKeyIdentifier.from_issuer_public_key(ca_key.public_key()), False)
+            builder = builder.add_extension(
+                x509.ExtendedKeyUsage([ExtendedKeyUsageOID.CLIENT_AUTH]), False)
+            builder = builder.add_extension(x509.KeyUsage(
+                True, False, False, False, False, False, False, False, False), False)
+            cert = builder.sign(ca_key, self.signature_hash(ca_key), default_backend())
+            cert_pem = cert.public_bytes(serialization.Encoding.PEM)
+
+            serial_hex = self.format_serial(serial)
+            with open(self.issued_dir + slug + '.crt', 'wb') as cert_file:
+                cert_file.write(cert_pem)
+            with open(self.certs_by_serial_dir + serial_hex + '.pem', 'wb') as cert_file:
+                cert_file.write(cert_pem)
+
+            record = ['V', self.format_index_time(not_after), '', serial_hex, 'unknown', '/CN=' + slug]
+            with open(self.index_path, 'a') as index_file:
+                index_file.write("\t".join(record) + "\n")
+
+            # OpenSSL keeps next serial in serial file.
+            with open(self.serial_path, 'w') as serial_file:
+                serial_file.write(self.format_serial(serial + 1) + "\n")
+        finally:
+            lock_file.close()
+
+        return cert_pem
+
+    def revoke_certificates(self, slugs, keep=None):
+        """Marks valid certificates of clients as revoked, returns slugs that got revoked.
+
+        Certificates whose serials are in keep stay valid.
+        """
+        keep = keep or set()
+        lock_file = self.lock()
+        try:
+            records = self.read_index()
+            now = self.format_index_time(datetime.datetime.now(datetime.timezone.utc))
+            common_names = set('CN=' + slug for slug in slugs)
+            revoked = list()
+
+            for fields in records:
+                if fields[0] != 'V' or fields[3] in keep:
+                    continue
+
+                matches = common_names.intersection(fields[5].split('/'))
+                if matches:
+                    fields[0] = 'R'
+                    fields[2] = now
+                    revoked.append(matches.pop()[len('CN='):])
+
+            if revoked:
+                self.write_index(records)
+        finally:
+            lock_file.close()
+
+        return revoked
+
+    def generate_crl(self, records=None):
+        """Generates CRL from revoked records of index.txt and writes it to PKI directory."""
+        ca_cert, ca_key = self.load_ca()
+        if records is None:
+            records = self.read_index()
+
+        now = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+        builder = x509.CertificateRevocationListBuilder()
+        builder = builder.issuer_name(ca_cert.subject)
+        builder = builder.last_update(now)
+        builder = builder.next_update(now + datetime.timedelta(days=self.crl_days))
+
+        for fields in records:
+            if fields[0] != 'R':
+                continue
+
+            revoked = x509.RevokedCertificateBuilder()
+            revoked = revoked.serial_number(int(fields[3], 16))
+            revoked = revoked.revocation_date(self.parse_index_time(fields[2]))
+            builder = builder.add_revoked_certificate(revoked.build(default_backend()))
+
+        crl = builder.sign(ca_key, self.signature_hash(ca_key), default_backend())
+        crl_pem = crl.public_bytes(serialization.Encoding.PEM)
+
+        temp_path = self.crl_path + '.tmp'
+        with open(temp_path, 'wb') as crl_file:
+            crl_file.write(crl_pem)
+        os.replace(temp_path, self.crl_path)
+
+        return crl_pem
@@ -10,7 +10,12 @@ class SimplifiedOpenvpnPrompt:
     prompts['server_dir'] = "Enter location of OpenVPN server's directory on your server"
     prompts['easy_rsa_dir'] = "Enter location of Easy RSA's directory on your server"
     prompts['easy_rsa_ver'] = 'Select version of Easy RSA that you are using (2|3)'
+    prompts['pki_backend'] = 'Select backend for issuing certificates (EASYRSA|NATIVE)'
+    prompts['key_algo'] = 'Select algorithm for client keys (RSA|EC|ED)'
+    prompts['key_curve'] = 'Select curve for client keys'
+    prompts['keypool_policy'] = 'Select what to do when key pool is empty (INLINE|FAIL)'
     prompts['clients_dir'] = "Enter location for client's directory on your server"
+    prompts['storage_mode'] = 'Select how config files are stored (EAGER|LAZY)'
     prompts['hostname'] = 'Enter the hostname of your server'
     prompts['protocol'] = 'Select protocol that you would like to use (TCP|UDP)'
     prompts['port'] = 'Select port that you are using for for your server'
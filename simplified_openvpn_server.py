@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""File that contains SimplifiedOpenvpnServer class."""
+
+import os
+import time
+import socket
+import signal
+import threading
+import traceback
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import ServerHandler
+from wsgiref.simple_server import WSGIServer
+from wsgiref.simple_server import WSGIRequestHandler
+
+
+class SimplifiedOpenvpnServerHandler(ServerHandler):
+    """WSGI handler that answers with HTTP/1.1 and tells when connection gets closed."""
+    http_version = '1.1'
+    chunked = False
+
+    def sendfile(self):
+        """Sends file response with zero-copy sendfile, ranges and HEAD still go through write."""
+        filelike = getattr(self.result, 'filelike', None)
+        length = self.headers.get('Content-Length')
+        if filelike is None or length is None or not hasattr(filelike, 'fileno'):
+            return False
+
+        self.send_headers()
+        self.request_handler.connection.sendfile(filelike, filelike.tell(), int(length))
+        self.bytes_sent = int(length)
+        return True
+
+    def cleanup_headers(self):
+        """Closes connection after response that can't be reused, streams get chunked."""
+        super().cleanup_headers()
+        request_handler = self.request_handler
+
+        # Streamed responses have no length, chunked encoding lets connection stay open.
+        if 'Content-Length' not in self.headers and request_handler.request_version == 'HTTP/1.1' \
+                and request_handler.command != 'HEAD' and self.status[:3] not in ['204', '304']:
+            self.headers['Transfer-Encoding'] = 'chunked'
+            self.chunked = True
+
+        if not (self.chunked or 'Content-Length' in self.headers) or \
+                not request_handler.keep_alive():
+            self.headers['Connection'] = 'close'
+            request_handler.close_connection = True
+
+    def write(self, data):
+        """Writes data of response, framed as chunk in chunked response."""
+        if not self.headers_sent:
+            # Length of single block response is known from its first write.
+            self.bytes_sent = len(data)
+            self.send_headers()
+        else:
+            self.bytes_sent += len(data)
+
+        if self.chunked:
+            if not data:
+                return
+            data = ('%x' % len(data)).encode('ascii') + b"\r\n" + data + b"\r\n"
+
+        self._write(data)
+        self._flush()
+
+    def finish_content(self):
+        """Ends response, chunked response ends with empty chunk."""
+        super().finish_content()
+        if self.chunked:
+            self._write(b"0\r\n\r\n")
+            self._flush()
+
+
+class SimplifiedOpenvpnRequestHandler(WSGIRequestHandler):
+    """Request handler that keeps connections alive for requests without body."""
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are separate writes, Nagle would hold body until ACK of headers.
+    disable_nagle_algorithm = True
+
+    def keep_alive(self):
+        """Checks if connection can be reused after current response."""
+        if self.server.stopping or self.close_connection:
+            return False
+        if self.command not in ['GET', 'HEAD']:
+            return False
+
+        # Request bodies are not drained, so only requests without one are safe.
+        return self.headers.get('Content-Length', '0') == '0' and \
+            'Transfer-Encoding' not in self.headers
+
+    def handle(self):
+        """Handles requests of connection until either side closes it."""
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection:
+            self.handle_one_request()
+
+    def handle_one_request(self):
+        """Handles single request, parse_request decides if client wants to keep connection."""
+        try:
+            self.raw_requestline = self.rfile.readline(65537)
+        except (socket.timeout, ConnectionError):
+            self.close_connection = True
+            return
+
+        if not self.raw_requestline:
+            self.close_connection = True
+            return
+
+        if len(self.raw_requestline) > 65536:
+            self.requestline = ''
+            self.request_version = ''
+            self.command = ''
+            self.send_error(414)
+            return
+
+        if not self.parse_request():
+            return
+
+        handler = SimplifiedOpenvpnServerHandler(
+            self.rfile, self.wfile, self.get_stderr(), self.get_environ(), multithread=True)
+        handler.request_handler = self
+        handler.run(self.server.get_app())
+
+    def log_message(self, *args):
+        """Requests are not logged to stderr."""
+
+
+class SimplifiedOpenvpnWSGIServer(ThreadingMixIn, WSGIServer):
+    """Threaded WSGI server of single worker with limited number of connections."""
+    daemon_threads = False
+    block_on_close = True
+
+    def __init__(self, sock, app, max_connections, keepalive_timeout):
+        """Sets up server on socket that was opened by parent process."""
+        # Idle keep-alive connections time out, so they don't hold slots forever.
+        SimplifiedOpenvpnRequestHandler.timeout = keepalive_timeout
+        super().__init__(sock.getsockname()[:2], SimplifiedOpenvpnRequestHandler, False)
+        self.socket.close()
+        self.socket = sock
+        self.server_name = socket.getfqdn(self.server_address[0])
+        self.server_port = self.server_address[1]
+        self.setup_environ()
+        self.set_app(app)
+
+        self.stopping = False
+        self.connections = set()
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        """Waits for free slot, so connections over limit stay in kernel's backlog."""
+        self._slots.acquire()
+        with self._lock:
+            self.connections.add(request)
+        super().process_request(request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        """Handles connection in its own thread and frees its slot afterwards."""
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            with self._lock:
+                self.connections.discard(request)
+            self._slots.release()
+
+    def stop(self):
+        """Stops accepting connections and lets requests in flight finish."""
+        self.stopping = True
+
+        # Idle keep-alive connections get end of stream, busy ones still write their response.
+        with self._lock:
+            for connection in self.connections:
+                try:
+                    connection.shutdown(socket.SHUT_RD)
+                except OSError:
+                    pass
+
+        self.shutdown()
+
+
+class SimplifiedOpenvpnServer:
+    """Class that serves WSGI application from pre-forked worker processes."""
+    # Worker that dies sooner than min_uptime after start counts as failed to start.
+    min_uptime = 5.0
+    respawn_delay = 0.5
+    max_respawn_delay = 30.0
+    max_failures = 8
+
+    def __init__(self, app, host, port, workers=2, max_connections=64, keepalive_timeout=15,
+                 initializer=None, finalizer=None, reloader=None):
+        """Sets up server, initializer gets called with worker's index in every worker after fork,
+        finalizer after worker has finished its requests and reloader when worker gets SIGHUP."""
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.max_connections = max_connections
+        self.keepalive_timeout = keepalive_timeout
+        self.initializer = initializer
+        self.finalizer = finalizer
+        self.reloader = reloader
+        self.stopping = False
+        self._workers = dict()
+
+    def listen(self):
+        """Opens listening socket that all workers accept connections from."""
+        family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+        sock = socket.create_server(
+            (self.host, self.port), family=family, backlog=self.workers * self.max_connections)
+        sock.set_inheritable(True)
+        return sock
+
+    def work(self, sock, index):
+        """Runs single worker until parent asks it to stop, never returns."""
+        # CTRL+C reaches whole process group, workers wait for parent to stop them instead.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        # Handler of parent was inherited, worker reloads itself instead of signalling others.
+        if self.reloader:
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.reloader())
+        else:
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+        status = 0
+        try:
+            if self.initializer:
+                self.initializer(index)
+
+            server = SimplifiedOpenvpnWSGIServer(
+                sock, self.app, self.max_connections, self.keepalive_timeout)
+
+            # Shutdown waits for serving loop, so it can't run in signal handler's thread.
+            signal.signal(
+                signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.stop).start())
+            server.serve_forever()
+            server.server_close()
+
+            if self.finalizer:
+                self.finalizer()
+        except BaseException:
+            traceback.print_exc()
+            status = 1
+        finally:
+            os._exit(status)
+
+    def spawn(self, sock, index):
+        """Forks new worker and returns its pid."""
+        pid = os.fork()
+        if pid == 0:
+            self.work(sock, index)
+        return pid
+
+    def stop(self, signum=None, frame=None):
+        # pylint: disable=W0613
+        """Marks server as stopping, workers get stopped from main loop."""
+        self.stopping = True
+
+    def reload(self, signum=None, frame=None):
+        # pylint: disable=W0613
+        """Passes SIGHUP to workers, so every one of them reloads between requests."""
+        for pid in list(self._workers):
+            os.kill(pid, signal.SIGHUP)
+
+    def reap(self):
+        """Returns pids of workers that have exited since last call."""
+        exited = list()
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return exited
+            if pid == 0:
+                return exited
+            if pid in self._workers:
+                exited.append(pid)
+
+    def serve(self):
+        """Starts workers, replaces ones that die and stops all of them gracefully.
+
+        Workers that keep dying right after start are replaced with growing delay, server
+        exits once the same worker failed to start max_failures times in a row.
+        """
+        sock = self.listen()
+        # Replacement of worker gets the same index as worker it replaces.
+        workers = self._workers
+        started = dict()
+        failures = dict()
+        pending = dict()
+        for index in range(self.workers):
+            pending[index] = 0.0
+
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGHUP, self.reload)
+
+        failed = False
+        while not self.stopping:
+            now = time.monotonic()
+            for pid in self.reap():
+                index = workers.pop(pid)
+                if now - started.pop(pid) < self.min_uptime:
+                    failures[index] = failures.get(index, 0) + 1
+                else:
+                    failures[index] = 0
+
+                if failures[index] >= self.max_failures:
+                    print('> Worker keeps failing right after start, stopping server.')
+                    failed = True
+                    self.stopping = True
+                    continue
+
+                delay = 0.0
+                if failures[index]:
+                    delay = min(
+                        self.respawn_delay * 2 ** (failures[index] - 1), self.max_respawn_delay)
+                print('> Worker ' + str(pid) + ' exited, starting new one in ' + str(delay) +
+                      ' seconds.')
+                pending[index] = now + delay
+
+            for index, respawn_at in list(pending.items()):
+                if not self.stopping and respawn_at <= now:
+                    pid = self.spawn(sock, index)
+                    workers[pid] = index
+                    started[pid] = now
+                    del pending[index]
+            time.sleep(0.5)
+
+        print('> Stopping workers.')
+        for pid in workers:
+            os.kill(pid, signal.SIGTERM)
+        for pid in workers:
+            os.waitpid(pid, 0)
+        sock.close()
+
+        if failed:
+            exit(1)
@@ -4,17 +4,36 @@
 """File that contains SimplifiedOpenvpnShare class."""
 
 import os
+import time
+import hashlib
+from contextlib import nullcontext
 
 from simplified_openvpn_helper import SimplifiedOpenvpnHelper as _helper
+from simplified_openvpn_template import SimplifiedOpenvpnTemplate
+from simplified_openvpn_cache import SimplifiedOpenvpnCache
+from simplified_openvpn_assets import SimplifiedOpenvpnAssets
 
 
 class SimplifiedOpenvpnShare:
     """Class that contains methods that will get used by sharing functionality."""
 
-    def __init__(self):
+    def __init__(self, config=None):
         """Initialises SimplifiedOpenvpnShare class."""
         self.container = _helper.sanitize_path(os.path.dirname(os.path.realpath(__file__)))
         self.override = self.container + 'local/'
+        self._config = config
+        self._template = SimplifiedOpenvpnTemplate(self.observe_render)
+        self._options = None
+        self._assets = SimplifiedOpenvpnAssets(config.clients_dir) if config else None
+        self.rendered = SimplifiedOpenvpnCache(256, 64 * 1024 * 1024)
+        self.pages = SimplifiedOpenvpnCache(4096, 16 * 1024 * 1024)
+        self.digests = SimplifiedOpenvpnCache(4096)
+        self.compressed = SimplifiedOpenvpnCache(1024, 32 * 1024 * 1024)
+        self.check_interval = 1.0
+        self.bundle_name = 'bundle.zip'
+        self.metrics = None
+        self._page_version = None
+        self._page_checked = 0.0
 
         if not os.path.isdir(self.override):
             self.override = None
@@ -36,8 +55,9 @@ class SimplifiedOpenvpnShare:
     @property
     def css(self):
         """Method that return CSS content for sharing page."""
-        if self.css_path:
-            return _helper.read_file_as_value(self.css_path)
+        path = self.css_path
+        if path:
+            return _helper.read_file_as_value(path)
 
         return None
 
@@ -49,8 +69,222 @@ class SimplifiedOpenvpnShare:
             if os.path.isfile(path):
                 return path
 
-            path = self.container + 'templates/share.mustache'
-            if os.path.isfile(path):
-                return path
+        path = self.container + 'templates/share.mustache'
+        if os.path.isfile(path):
+            return path
+
+        return None
+
+    @property
+    def client_template_path(self):
+        """Returns path of client's config template on server."""
+        return self._config.server_dir + 'client.mustache'
+
+    def timer(self, phase):
+        """Returns context that measures phase of request if share server collects metrics."""
+        if self.metrics is None:
+            return nullcontext()
+        return self.metrics.time(phase)
+
+    def observe_render(self, flavour, seconds):
+        """Records render time of single flavour if share server collects metrics."""
+        if self.metrics is not None:
+            self.metrics.observe(('flavour', flavour or 'default'), seconds)
+
+    def is_lazy(self, slug):
+        """Checks if client keeps only keys and gets its configs rendered on demand."""
+        return os.path.isfile(self._config.clients_dir + slug + '/' + slug + '.crt')
+
+    def config_files(self, slug):
+        """Returns names of config files that can be downloaded by client."""
+        if self.is_lazy(slug):
+            return [
+                self._template.config_name(self._config.hostname, flavour)
+                for flavour in self._template.flavours
+            ]
+
+        with self.timer('listdir'):
+            names = sorted(os.listdir(self._config.clients_dir + slug))
+
+        files = list()
+        for config_file in names:
+            # Hidden files are temporary files of configs that are still being written.
+            if config_file.startswith('.') or config_file == 'pretty-name.txt':
+                continue
+            # Compressed variants are served in place of originals.
+            if config_file.endswith(('.gz', '.br')):
+                continue
+            files.append(config_file)
+        return files
+
+    @staticmethod
+    def mtime(path):
+        """Returns modification time of file or None if there is no file."""
+        if path is None:
+            return None
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def page_version(self):
+        """Returns paths and mtimes of share page's template and CSS, checked once per interval."""
+        now = time.monotonic()
+        if self._page_version is None or now - self._page_checked >= self.check_interval:
+            template_path = self.template_path
+            css_path = self.css_path
+            self._page_version = (
+                template_path, self.mtime(template_path), css_path, self.mtime(css_path))
+            self._page_checked = now
+        return self._page_version
+
+    def render_page(self, slug, share_hash):
+        """Returns client's share page, cached until client's directory, template or CSS change."""
+        key = (slug, share_hash)
+        cached = self.pages.get(key)
+        now = time.monotonic()
+
+        # Recently validated page is served without touching the disk.
+        if cached and now - cached[2] < self.check_interval:
+            return cached[0]
+
+        client_dir = self._config.clients_dir + slug + '/'
+        version = (self.mtime(client_dir),) + self.page_version()
+        if cached and cached[1] == version:
+            self.pages.put(key, (cached[0], version, now))
+            return cached[0]
 
+        template_path, _, css_path, _ = version[1:]
+        data = dict()
+        data['css'] = _helper.read_file_as_value(css_path) if css_path else None
+        data['slug'] = slug
+        data['client_name'] = _helper.read_file_as_value(client_dir + 'pretty-name.txt') or slug
+        data['list_items'] = ''.join([
+            '<li><a href="' + share_hash + '/' + config_file + '">' + config_file + '</a></li>'
+            for config_file in self.config_files(slug) + [self.bundle_name]])
+
+        with self.timer('render'):
+            page = SimplifiedOpenvpnTemplate.render_path(template_path, data)
+        self.pages.put(key, (page, version, now))
+        return page
+
+    def config_digest(self, slug, config_file):
+        """Returns hash of client's stored config file or None if it's not downloadable."""
+        client_dir = self._config.clients_dir + slug + '/'
+        manifest_mtime = self.mtime(client_dir + self._assets.digests_file)
+
+        if manifest_mtime is not None:
+            cached = self.digests.get(slug)
+            if cached is None or cached[0] != manifest_mtime:
+                cached = self.digests.put(
+                    slug, (manifest_mtime, self._assets.read_digests(client_dir) or dict()))
+            return cached[1].get(config_file)
+
+        # Clients generated before hashes were recorded get their files hashed once.
+        if config_file not in self.config_files(slug):
+            return None
+
+        path = client_dir + config_file
+        key = (path, self.mtime(path))
+        digest = self.digests.get(key)
+        if digest is None:
+            with open(path, 'rb') as config:
+                digest = self.digests.put(key, hashlib.sha256(config.read()).hexdigest())
+        return digest
+
+    def bundle_entries(self, slug):
+        """Returns entries of archive that contains every flavour of client's config files."""
+        entries = list()
+        for config_file in self.config_files(slug):
+            if self.is_lazy(slug):
+                entries.append((
+                    config_file,
+                    lambda config_file=config_file: self.render_config(slug, config_file)[0]))
+            else:
+                entries.append((config_file, self._config.clients_dir + slug + '/' + config_file))
+        return entries
+
+    @staticmethod
+    def is_compressible(config_file):
+        """Checks if config file is worth compressing, archives are compressed already."""
+        return not config_file.endswith('.zip')
+
+    def compress_config(self, digest, encoding, load):
+        """Returns compressed config file from bounded cache, load() is called on first request."""
+        key = (digest, encoding)
+        data = self.compressed.get(key)
+        if data is None:
+            with self.timer('render'):
+                data = self.compressed.put(key, _helper.compress(load(), encoding))
+        return data
+
+    def find_flavour(self, config_file):
+        """Returns flavour that matches name of config file or None."""
+        for flavour in self._template.flavours:
+            if self._template.config_name(self._config.hostname, flavour) == config_file:
+                return flavour
         return None
+
+    def base_options(self):
+        """Returns options that are shared between all clients, external IP is fetched once."""
+        if self._options is None:
+            options = dict()
+            options['protocol'] = self._config.protocol
+            options['hostname'] = self._config.hostname
+            options['ipv4'] = self._config.ipv4
+            options['port'] = self._config.port
+            self._options = options
+        return self._options
+
+    def load_key_material(self, slug):
+        """Reads client's keys together with CA and TLS Auth key that client was built with."""
+        client_dir = self._config.clients_dir + slug + '/'
+        material = dict()
+        references = self._assets.read_references(client_dir)
+
+        if references:
+            material['ca'] = self._assets.get(references['ca'])
+            material['ta'] = self._assets.get(references['ta'])
+        else:
+            for name, path in [('ca', self._config.ca_path), ('ta', self._config.ta_path)]:
+                with open(path) as material_file:
+                    material[name] = material_file.read()
+
+        for name, path in [
+                ('cert', client_dir + slug + '.crt'),
+                ('key', client_dir + slug + '.key')]:
+            with open(path) as material_file:
+                material[name] = material_file.read()
+
+        return material
+
+    def render_config(self, slug, config_file):
+        """Renders config file for lazy client, returns its data and hash or None for unknown files."""
+        flavour = self.find_flavour(config_file)
+        if flavour is None:
+            return None
+
+        # Renewing client's certificate changes its mtime and therefore cache key.
+        cert_mtime = os.stat(self._config.clients_dir + slug + '/' + slug + '.crt').st_mtime_ns
+        key = (slug, config_file, cert_mtime)
+        cached = self.rendered.get(key)
+        if cached is not None:
+            return cached
+
+        with self.timer('render'):
+            material = self.load_key_material(slug)
+            options = dict(self.base_options())
+            options['slug'] = slug
+            options['ca'] = material['ca'].rstrip()
+            options['cert'] = material['cert'].rstrip()
+            options['key'] = material['key'].rstrip()
+            options['ta'] = material['ta'].rstrip()
+
+            content = self._template.render_flavour(self.client_template_path, options, flavour)
+            if self._template.is_inline(flavour):
+                data = content.encode('utf-8')
+            else:
+                data = self._template.build_archive(
+                    config_file[:-len('.zip')], content, slug, material)
+
+        return self.rendered.put(key, (data, hashlib.sha256(data).hexdigest()))
@@ -59,6 +59,40 @@ class SimplifiedOpenvpnSuggest:
         suggestion = __class__.get_value_from_sample(_helper.current_method(), sample_path)
         return suggestion
 
+    @staticmethod
+    def pki_backend(sample_path=None):
+        # pylint: disable=E0602
+        """Getting suggestion for pki_backend."""
+        suggestion = __class__.get_value_from_sample(_helper.current_method(), sample_path)
+        if suggestion is None:
+            suggestion = 'easyrsa'
+        return suggestion
+
+    @staticmethod
+    def key_algo(sample_path=None):
+        # pylint: disable=E0602
+        """Getting suggestion for key_algo."""
+        suggestion = __class__.get_value_from_sample(_helper.current_method(), sample_path)
+        if suggestion is None:
+            suggestion = 'rsa'
+        return suggestion
+
+    @staticmethod
+    def key_curve(sample_path=None):
+        # pylint: disable=E0602
+        """Getting suggestion for key_curve."""
+        suggestion = __class__.get_value_from_sample(_helper.current_method(), sample_path)
+        return suggestion
+
+    @staticmethod
+    def keypool_policy(sample_path=None):
+        # pylint: disable=E0602
+        """Getting suggestion for keypool_policy."""
+        suggestion = __class__.get_value_from_sample(_helper.current_method(), sample_path)
+        if suggestion is None:
+            suggestion = 'inline'
+        return suggestion
+
     @staticmethod
     def clients_dir(sample_path=None):
         # pylint: disable=E0602
@@ -68,6 +102,15 @@ class SimplifiedOpenvpnSuggest:
             suggestion = _helper.sanitize_path(os.path.expanduser('~')) + 'openvpn-clients'
         return suggestion
 
+    @staticmethod
+    def storage_mode(sample_path=None):
+        # pylint: disable=E0602
+        """Getting suggestion for storage_mode."""
+        suggestion = __class__.get_value_from_sample(_helper.current_method(), sample_path)
+        if suggestion is None:
+            suggestion = 'eager'
+        return suggestion
+
     @staticmethod
     def hostname(sample_path=None):
         # pylint: disable=E0602
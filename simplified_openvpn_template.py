@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""File that contains SimplifiedOpenvpnTemplate class."""
+
+import io
+import os
+import time
+import zipfile
+from collections import OrderedDict
+import pystache
+
+
+class SimplifiedOpenvpnChunks(io.RawIOBase):
+    """Write-only stream that collects written bytes until they are taken out as chunk."""
+
+    def __init__(self):
+        """Sets up empty buffer."""
+        super().__init__()
+        self._chunks = list()
+
+    def writable(self):
+        """Stream can be written to, but not read from or seeked."""
+        return True
+
+    def write(self, data):
+        """Collects written bytes."""
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        """Returns bytes written since last call and empties buffer."""
+        chunk = b''.join(self._chunks)
+        self._chunks = list()
+        return chunk
+
+
+class SimplifiedOpenvpnTemplate:
+    """Class that caches parsed mustache templates and renders config flavours from them."""
+    cache = dict()
+    renderer = pystache.Renderer()
+
+    flavours = OrderedDict()
+    flavours[''] = dict()
+    flavours['deb'] = {'deb': True}
+    flavours['rhel'] = {'rhel': True}
+    flavours['inline'] = {'inline': True}
+    flavours['inline-deb'] = {'inline': True, 'deb': True}
+    flavours['inline-rhel'] = {'inline': True, 'rhel': True}
+
+    def __init__(self, observer=None):
+        """Sets up counters for render cost of every flavour, observer gets every measurement."""
+        self.timings = dict()
+        self.observer = observer
+
+    @staticmethod
+    def load(path):
+        """Returns parsed template, parses it again only if file has been modified."""
+        mtime = os.stat(path).st_mtime_ns
+        cached = SimplifiedOpenvpnTemplate.cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        with open(path) as template_file:
+            parsed = pystache.parse(template_file.read())
+
+        SimplifiedOpenvpnTemplate.cache[path] = (mtime, parsed)
+        return parsed
+
+    @staticmethod
+    def render_path(path, *context):
+        """Renders template from given path using cached parse tree."""
+        return SimplifiedOpenvpnTemplate.renderer.render(
+            SimplifiedOpenvpnTemplate.load(path), *context)
+
+    @staticmethod
+    def is_inline(flavour):
+        """Checks if flavour embeds keys into config file."""
+        return bool(SimplifiedOpenvpnTemplate.flavours[flavour].get('inline'))
+
+    @staticmethod
+    def config_name(hostname, flavour=''):
+        """Returns file name of config for given flavour, non-inline flavours are zipped."""
+        name = hostname
+        if flavour != '':
+            name += '-' + flavour
+        name += '.ovpn'
+
+        if not SimplifiedOpenvpnTemplate.is_inline(flavour):
+            name += '.zip'
+        return name
+
+    @staticmethod
+    def build_archive(config_name, content, slug, material):
+        """Builds ZIP archive of config and keys in memory and returns it as bytes."""
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as config_zip:
+            config_zip.writestr(config_name, content)
+            config_zip.writestr('ca.crt', material['ca'])
+            config_zip.writestr(slug + '.crt', material['cert'])
+            config_zip.writestr(slug + '.key', material['key'])
+            config_zip.writestr('ta.key', material['ta'])
+        return buffer.getvalue()
+
+    @staticmethod
+    def stream_archive(entries, chunk_size=64 * 1024):
+        """Returns generator of ZIP archive chunks, whole archive is never kept anywhere.
+
+        Entries are tuples of name and either path of file or function that returns bytes.
+        """
+        def generate():
+            stream = SimplifiedOpenvpnChunks()
+
+            # Unseekable stream makes zipfile write sizes after data instead of seeking back.
+            with zipfile.ZipFile(stream, 'w') as archive:
+                for name, source in entries:
+                    info = zipfile.ZipInfo(name, time.localtime()[:6])
+                    info.external_attr = 0o600 << 16
+
+                    # Archives of other flavours are compressed already.
+                    if not name.endswith('.zip'):
+                        info.compress_type = zipfile.ZIP_DEFLATED
+
+                    with archive.open(info, 'w') as entry:
+                        if callable(source):
+                            data = source()
+                            for offset in range(0, len(data), chunk_size):
+                                entry.write(data[offset:offset + chunk_size])
+                                yield stream.take()
+                        else:
+                            with open(source, 'rb') as source_file:
+                                for chunk in iter(lambda: source_file.read(chunk_size), b''):
+                                    entry.write(chunk)
+                                    yield stream.take()
+                    yield stream.take()
+            yield stream.take()
+
+        # Entries are written in small pieces, so some writes don't produce output yet.
+        return (chunk for chunk in generate() if chunk)
+
+    def render_flavour(self, path, context, flavour=''):
+        """Renders single flavour of config, flavour's options take precedence over context."""
+        parsed = self.load(path)
+        options = dict()
+        options['inline'] = False
+        options['deb'] = False
+        options['rhel'] = False
+        options.update(self.flavours[flavour])
+
+        start = time.perf_counter()
+        content = self.renderer.render(parsed, context, options)
+        elapsed = time.perf_counter() - start
+
+        timing = self.timings.setdefault(flavour, [0, 0.0])
+        timing[0] += 1
+        timing[1] += elapsed
+        if self.observer:
+            self.observer(flavour, elapsed)
+        return content
+
+    def render_flavours(self, path, context):
+        """Renders all flavours of config from one parsed template and shared context."""
+        rendered = OrderedDict()
+        for flavour in self.flavours:
+            rendered[flavour] = self.render_flavour(path, context, flavour)
+        return rendered
+
+    def average_timings(self):
+        """Returns average render time in seconds for every flavour."""
+        averages = OrderedDict()
+        for flavour in self.flavours:
+            timing = self.timings.get(flavour)
+            if timing:
+                averages[flavour] = timing[1] / timing[0]
+        return averages
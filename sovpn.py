@@ -7,10 +7,12 @@
 
 import sys
 import os
+import signal
 import logging
-import pystache
 
 from flask import Flask
+from flask import Response
+from flask import request
 from flask import send_file
 from flask import abort
 
@@ -20,11 +22,31 @@ from simplified_openvpn_config import SimplifiedOpenvpnConfig
 from simplified_openvpn_data import SimplifiedOpenvpnData
 from simplified_openvpn_share import SimplifiedOpenvpnShare
 from simplified_openvpn_mgmt import SimplifiedOpenvpnMgmt
+from simplified_openvpn_keypool import SimplifiedOpenvpnKeypool
+from simplified_openvpn_assets import SimplifiedOpenvpnAssets
+from simplified_openvpn_template import SimplifiedOpenvpnTemplate
+from simplified_openvpn_lookup import SimplifiedOpenvpnLookup
+from simplified_openvpn_index import SimplifiedOpenvpnIndex
+from simplified_openvpn_server import SimplifiedOpenvpnServer
+from simplified_openvpn_limits import SimplifiedOpenvpnLimits
+from simplified_openvpn_metrics import SimplifiedOpenvpnMetrics
 
 LOG = logging.getLogger('werkzeug')
 LOG.setLevel(logging.ERROR)
 
-if (len(sys.argv) == 1 or sys.argv[1].lower() == 'create'):
+if (len(sys.argv) > 2 and sys.argv[1].lower() == 'create' and sys.argv[2] == '--batch'):
+    # Create clients in bulk.
+    if len(sys.argv) != 4:
+        print('> Usage: ' + sys.argv[0] + ' create --batch [FILE|-]')
+        exit(1)
+
+    PRETTY_NAMES = _helper.read_names_from_csv(sys.argv[3])
+    if PRETTY_NAMES is None:
+        exit(1)
+
+    SOVPN = SimplifiedOpenvpn()
+    SOVPN.create_clients(PRETTY_NAMES)
+elif (len(sys.argv) == 1 or sys.argv[1].lower() == 'create'):
     # Crate client.
     if len(sys.argv) > 2:
         PRETTY_NAME = ' '.join(sys.argv[2:]).strip()
@@ -37,112 +59,452 @@ elif len(sys.argv) > 1 and sys.argv[1].lower() == 'revoke':
     # Revoke.
     COMMON_NAMES = list()
 
-    if len(sys.argv) > 2:
+    if len(sys.argv) == 4 and sys.argv[2] == '--batch':
+        COMMON_NAMES = _helper.read_names_from_csv(sys.argv[3])
+        if COMMON_NAMES is None:
+            exit(1)
+    elif len(sys.argv) > 2 and sys.argv[2] != '--batch':
         for common_name in sys.argv[2:]:
-            COMMON_NAMES.append(common_name)
-    elif len(sys.argv) == 2:
-        COMMON_NAMES.append(sys.argv[2].strip())
+            COMMON_NAMES.append(common_name.strip())
     else:
-        print('> Usage: ' + sys.argv[0] + ' revoke [Common Name]')
+        print('> Usage: ' + sys.argv[0] + ' revoke [Common Name] ...')
+        print('> Usage: ' + sys.argv[0] + ' revoke --batch [FILE|-]')
         exit(1)
 
     SOVPN = SimplifiedOpenvpn()
-
-    for COMMON_NAME in COMMON_NAMES:
-        SOVPN.revoke_client(COMMON_NAME)
+    SOVPN.revoke_clients(COMMON_NAMES)
 elif len(sys.argv) > 1 and sys.argv[1] == 'share':
     # Share.
     CONFIG = SimplifiedOpenvpnConfig()
-    DB = SimplifiedOpenvpnData()
-    SHARE = SimplifiedOpenvpnShare()
+    DB = SimplifiedOpenvpnData(CONFIG, read_only=True)
+    LOOKUP = SimplifiedOpenvpnLookup(DB)
     APP = Flask(__name__)
-    PATH = CONFIG.clients_dir
-    ALLOWED_SLUGS = None
+    # Scanners get rate limited and answered before they reach routes.
+    LIMITS = SimplifiedOpenvpnLimits(APP.wsgi_app, **CONFIG.sovpn_share_limits)
+    APP.wsgi_app = LIMITS
+    ALLOWED_SLUGS = list()
+    ALLOWLIST = None
+    ARGUMENTS = sys.argv[2:]
+    TOKEN_TTL = 7 * 24 * 60 * 60
+    WORKERS = None
+    METRICS = None
+    METRICS_ADDRESS = None
+    ACCESS_LOG = None
+    ENCODINGS = _helper.content_encodings()
+
+    # Lifetime of printed share tokens can be changed in days, workers enable pre-fork server,
+    # metrics get served from separate address, access log gets written to file and allowlist
+    # gets read from file that is read again on SIGHUP.
+    OPTIONS = ['--ttl', '--workers', '--metrics', '--access-log', '--allowlist']
+    while ARGUMENTS[:1] and ARGUMENTS[0] in OPTIONS:
+        if len(ARGUMENTS) < 2 or (
+                ARGUMENTS[0] in ['--ttl', '--workers', '--metrics'] and
+                not ARGUMENTS[1].rsplit(':', 1)[-1].isdigit()):
+            print(
+                '> Usage: ' + sys.argv[0] +
+                ' share [--ttl DAYS] [--workers N] [--metrics [ADDRESS:]PORT]' +
+                ' [--access-log FILE] [--allowlist FILE] [Common Name] ...')
+            exit(1)
+
+        if ARGUMENTS[0] == '--ttl':
+            TOKEN_TTL = int(ARGUMENTS[1]) * 24 * 60 * 60
+        elif ARGUMENTS[0] == '--workers':
+            WORKERS = max(int(ARGUMENTS[1]), 1)
+        elif ARGUMENTS[0] == '--metrics':
+            METRICS_ADDRESS = ARGUMENTS[1]
+        elif ARGUMENTS[0] == '--access-log':
+            ACCESS_LOG = ARGUMENTS[1]
+        else:
+            ALLOWLIST = ARGUMENTS[1]
+        ARGUMENTS = ARGUMENTS[2:]
+
+    for slug in ARGUMENTS:
+        slugs = DB.get_all_client_slugs()
+        # Check if client with given slug exists in database.
+        if slugs and slug not in slugs:
+            print('> Client "' + slug + '"' + " doesn't exist in database.")
+            exit(1)
+
+        ALLOWED_SLUGS.append(slug)
+
+    def load_state(config, generation):
+        """Returns config, share and allowlist that requests use, so they can be swapped at once."""
+        allowed = None
+        if ALLOWED_SLUGS or ALLOWLIST:
+            # Allowlist is set of slugs, so checking it doesn't depend on number of clients.
+            allowed = set(ALLOWED_SLUGS)
+            if ALLOWLIST:
+                names = _helper.read_names_from_csv(ALLOWLIST)
+                if names is None:
+                    return None
+                allowed.update(names)
+
+        share = SimplifiedOpenvpnShare(config)
+        share.metrics = METRICS
+
+        state = dict()
+        state['config'] = config
+        state['share'] = share
+        state['allowed'] = allowed
+        state['generation'] = generation
+        return state
+
+    STATE = load_state(CONFIG, 0)
+    if STATE is None:
+        exit(1)
 
     # If slugs are specified, then only allow sharing for specific clients.
-    if len(sys.argv) > 2:
+    if STATE['allowed'] is not None:
         # As we are only serving files to specific clients we can aswell output their hashes.
-        ALLOWED_SLUGS = list()
         print('> Sharing confirguration files for specific clients:', end="\n\n", flush=True)
 
-        for slug in sys.argv[2:]:
-            slugs = DB.get_all_client_slugs()
-            # Check if client with given slug exists in database.
-            if slugs and slug not in slugs:
-                print('> Client "' + slug + '"' + " doesn't exist in database.")
-                exit(1)
-
-            ALLOWED_SLUGS.append(slug)
-
-        for slug in ALLOWED_SLUGS:
+        for slug in sorted(STATE['allowed']):
             share_hash = DB.find_client_share_hash_by_slug(slug)
-            text_padding = 14
+            if share_hash is None:
+                print('> Client "' + slug + '"' + " doesn't exist in database.", end="\n\n")
+                continue
+
+            share_token = _helper.generate_share_token(
+                slug, CONFIG.sovpn_share_salt + share_hash, TOKEN_TTL)
+            text_padding = 15
 
             print('> Client'.ljust(text_padding) + ' : ' + slug)
             print('> Sharing Hash'.ljust(text_padding) + ' : ' + share_hash)
+            print('> Sharing Token'.ljust(text_padding) + ' : ' + share_token)
 
             # Output sharing URL if sovpn_share_url property is set.
             if CONFIG.sovpn_share_url:
                 print(
                     '> Sharing URL'.ljust(text_padding) +
-                    ' : ' + CONFIG.sovpn_share_url + share_hash)
+                    ' : ' + CONFIG.sovpn_share_url + share_token)
 
             print()
     else:
         print('> Sharing confirguration files for everybody.')
 
+    print(
+        '> Limits: ' + str(LIMITS.rate) + ' requests/s per address (burst ' +
+        str(LIMITS.burst) + '), ' + str(LIMITS.max_requests) + ' concurrent requests.')
     print('> Press CTRL+C to stop.')
 
+    def reload_state(signum=None, frame=None):
+        # pylint: disable=W0603
+        # pylint: disable=W0613
+        """Reloads config, share page's caches and allowlist, failed reload keeps current ones."""
+        global STATE
+        try:
+            state = load_state(STATE['config'].reload(), STATE['generation'] + 1)
+        except (SystemExit, OSError, ValueError):
+            state = None
+
+        if state is None:
+            print('> Reloading failed, keeping previous configuration.', flush=True)
+            return
+
+        # Parsed templates are checked by mtime anyway, reload only makes sure they are read again.
+        SimplifiedOpenvpnTemplate.cache = dict()
+        # Requests that already hold previous state finish with it, new ones get new state.
+        STATE = state
+        print('> Reloaded configuration and allowlist.', flush=True)
+
+    def resolve_slug(share_hash, config):
+        """Resolves slug from signed share token or from legacy share hash, both from memory.
+
+        Returns slug and whether share hash is unknown to lookup index, only those misses
+        may be remembered, other checks depend on state that the index doesn't track.
+        """
+        if '.' in share_hash:
+            # Tokens are signed with client's share hash too, so renewing client revokes them.
+            client_hash = LOOKUP.find_share_hash(share_hash.split('.')[0])
+            if client_hash is None:
+                return None, True
+
+            slug = _helper.verify_share_token(share_hash, config.sovpn_share_salt + client_hash)
+            if slug is None or not os.path.isdir(config.clients_dir + slug):
+                return None, False
+            return slug, False
+
+        slug = LOOKUP.find_slug(share_hash)
+        return slug, slug is None
+
+    def find_slug(share_hash, state):
+        """Resolves slug, unknown hashes are rejected until lookup index or config changes."""
+        generation = (LOOKUP.rebuilds, state['generation'])
+        if LIMITS.is_unknown(share_hash, generation):
+            return None
+
+        with state['share'].timer('db'):
+            slug, unknown = resolve_slug(share_hash, state['config'])
+        if unknown:
+            LIMITS.remember_unknown(share_hash, generation)
+        return slug
+
     @APP.after_request
-    def add_headers(request):
+    def add_headers(response):
         """Adds headers for request that will prevent caching of sensitive files."""
-        request.headers['Pragma'] = 'no-cache'
-        request.headers['Expires'] = '0'
-        request.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate, public, max-age=0'
-        return request
+        response.headers['Pragma'] = 'no-cache'
+        response.headers['Expires'] = '0'
 
-    @APP.route('/<share_hash>')
-    def client_page(share_hash):
-        """Display all flavours of client's config files to user."""
-        slug = DB.find_client_slug_by_share_hash(share_hash)
+        # Config files can be revalidated with their ETag, but never stored by shared caches.
+        if 'ETag' in response.headers:
+            response.headers['Cache-Control'] = 'private, no-cache, max-age=0'
+        else:
+            response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0'
+        return response
+
+    def find_client(share_hash, state):
+        """Returns slug of client that may download its files, aborts request otherwise."""
+        slug = find_slug(share_hash, state)
         if slug is None:
             abort(404)
-        if ALLOWED_SLUGS is not None:
-            if slug not in ALLOWED_SLUGS:
+        if state['allowed'] is not None:
+            if slug not in state['allowed']:
                 abort(403)
+        return slug
 
-        data = dict()
-        data['css'] = SHARE.css
-        data['slug'] = slug
-        data['client_name'] = slug
-        data['list_items'] = ''
+    @APP.route('/<share_hash>')
+    def client_page(share_hash):
+        """Display all flavours of client's config files to user."""
+        state = STATE
+        slug = find_client(share_hash, state)
 
-        files = os.listdir(PATH + slug)
-        for config_file in files:
-            if config_file == 'pretty-name.txt':
-                data['client_name'] = _helper.read_file_as_value(PATH + slug + '/' + config_file)
-                continue
+        return state['share'].render_page(slug, share_hash)
+
+    def read_bytes(path):
+        """Returns content of file as bytes."""
+        with open(path, 'rb') as content:
+            return content.read()
 
-            anchor = '<a href="' + share_hash + '/' + config_file +  '">' + config_file + '</a>'
-            data['list_items'] += '<li>' + anchor + '</li>'
+    @APP.route('/<share_hash>/bundle.zip')
+    def download_bundle(share_hash):
+        """Streams ZIP archive of all flavours of client's config files."""
+        state = STATE
+        slug = find_client(share_hash, state)
 
-        renderer = pystache.Renderer()
-        return renderer.render_path(SHARE.template_path, data)
+        # Archive is generated while it's being sent, so memory use doesn't depend on its size.
+        chunks = SimplifiedOpenvpnTemplate.stream_archive(state['share'].bundle_entries(slug))
+        response = Response(chunks, mimetype='application/zip')
+        response.headers['Content-Disposition'] = 'attachment; filename="' + slug + '.zip"'
+        return response
 
     @APP.route('/<share_hash>/<config_file>')
     def download_config(share_hash, config_file):
         """Serve client's config file and make it downloadable."""
-        slug = DB.find_client_slug_by_share_hash(share_hash)
-        if slug is None:
-            abort(404)
-        if ALLOWED_SLUGS is not None:
-            if slug not in ALLOWED_SLUGS:
-                abort(403)
+        state = STATE
+        slug = find_client(share_hash, state)
+        share = state['share']
+
+        data = None
+        encoding = None
+        if share.is_compressible(config_file):
+            encoding = request.accept_encodings.best_match(list(ENCODINGS))
+
+        # Clients in lazy storage mode get their config files rendered on first request.
+        if share.is_lazy(slug):
+            rendered = share.render_config(slug, config_file)
+            if rendered is None:
+                abort(404)
+
+            data, digest = rendered
+            if encoding:
+                data = share.compress_config(digest, encoding, lambda: rendered[0])
+        else:
+            # Only files that were generated for client can be downloaded.
+            digest = share.config_digest(slug, config_file)
+            if digest is None:
+                abort(404)
+
+            path = state['config'].clients_dir + slug + '/' + config_file
+            if encoding and os.path.isfile(path + ENCODINGS[encoding]):
+                path += ENCODINGS[encoding]
+            elif encoding:
+                # Files generated before variants existed get compressed on the fly.
+                data = share.compress_config(digest, encoding, lambda: read_bytes(path))
+
+        # Every representation has its own ETag.
+        if encoding:
+            digest += '-' + encoding
+
+        # Conditional response answers If-None-Match with 304 and Range with 206.
+        if data is None:
+            response = send_file(
+                path, mimetype='application/octet-stream', as_attachment=True,
+                download_name=config_file, etag=digest, conditional=True)
+        else:
+            response = Response(data, mimetype='application/octet-stream')
+            response.headers['Content-Disposition'] = 'attachment; filename="' + config_file + '"'
+            response.set_etag(digest)
+            response = response.make_conditional(request, accept_ranges=True)
+
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if share.is_compressible(config_file):
+            response.vary.add('Accept-Encoding')
+        return response
 
-        return send_file(PATH + slug + '/' + config_file)
+    def collect_stats():
+        """Returns counters of caches, lookup index and limits of current process."""
+        stats = dict()
+        share = STATE['share']
+        caches = [
+            ('pages', share.pages), ('rendered', share.rendered), ('digests', share.digests),
+            ('compressed', share.compressed), ('unknown', LIMITS.unknown)]
+
+        for name, cache in caches:
+            labels = '{cache="' + name + '"}'
+            stats['sovpn_share_cache_hits_total' + labels] = cache.hits if cache else 0
+            stats['sovpn_share_cache_misses_total' + labels] = cache.misses if cache else 0
+            stats['sovpn_share_cache_entries' + labels] = len(cache) if cache else 0
+            stats['sovpn_share_cache_bytes' + labels] = cache.size if cache else 0
+
+        lookup = LOOKUP.stats()
+        stats['sovpn_share_lookup_entries'] = lookup['entries']
+        stats['sovpn_share_lookup_hits_total'] = lookup['hits']
+        stats['sovpn_share_lookup_misses_total'] = lookup['misses']
+        stats['sovpn_share_lookup_rebuilds_total'] = lookup['rebuilds']
+        stats['sovpn_share_lookup_memory_bytes'] = lookup['memory_size']
+
+        limits = LIMITS.stats()
+        stats['sovpn_share_rate_limited_total'] = limits['limited']
+        stats['sovpn_share_shed_total'] = limits['shed']
+        stats['sovpn_share_in_flight'] = limits['in_flight']
+        stats['sovpn_share_limited_addresses'] = limits['addresses']
+        return stats
+
+    # Requests get measured only if somebody reads metrics or access log.
+    if METRICS_ADDRESS or ACCESS_LOG:
+        # Every worker has its own slot, parent or single process uses the first one.
+        METRICS = SimplifiedOpenvpnMetrics(
+            APP.wsgi_app, collect_stats, CONFIG.sovpn_share_limits, (WORKERS or 0) + 1, ACCESS_LOG)
+        APP.wsgi_app = METRICS
+        STATE['share'].metrics = METRICS
+
+    if METRICS_ADDRESS:
+        METRICS_HOST, _, METRICS_PORT = METRICS_ADDRESS.rpartition(':')
+        METRICS_HOST = METRICS_HOST.strip('[]') or '127.0.0.1'
+        METRICS.serve(METRICS_HOST, int(METRICS_PORT))
+        print('> Serving metrics on ' + METRICS_ADDRESS + '/metrics.')
+
+    def initialize_worker(index):
+        """Opens connections of forked worker and selects its metrics slot."""
+        LOOKUP.reconnect()
+        if METRICS:
+            METRICS.use(index + 1)
 
     # Binding address and port for sharing proccess.
-    APP.run(host=CONFIG.sovpn_share_address, port=CONFIG.sovpn_share_port)
+    if WORKERS:
+        # Every worker opens its own connections after fork.
+        DB.close()
+        LOOKUP.close()
+
+        print('> Serving with ' + str(WORKERS) + ' workers.')
+        SERVER = SimplifiedOpenvpnServer(
+            APP, CONFIG.sovpn_share_address, CONFIG.sovpn_share_port, WORKERS,
+            initializer=initialize_worker, finalizer=METRICS.close if METRICS else None,
+            reloader=reload_state)
+        SERVER.serve()
+    else:
+        if METRICS:
+            METRICS.use(0)
+        signal.signal(signal.SIGHUP, reload_state)
+        try:
+            APP.run(host=CONFIG.sovpn_share_address, port=CONFIG.sovpn_share_port)
+        finally:
+            if METRICS:
+                METRICS.close()
+elif len(sys.argv) > 2 and sys.argv[1] == 'keypool':
+    # Key pool.
+    CONFIG = SimplifiedOpenvpnConfig()
+    KEYPOOL = SimplifiedOpenvpnKeypool(CONFIG.keypool_dir, CONFIG.key_algo, CONFIG.key_curve)
+    ACTION = sys.argv[2]
+
+    if ACTION in ['fill', 'worker'] and len(sys.argv) == 4 and sys.argv[3].isdigit():
+        if ACTION == 'fill':
+            KEYPOOL.fill(int(sys.argv[3]))
+        else:
+            print('> Keeping key pool filled with ' + sys.argv[3] + ' keys, press CTRL+C to stop.')
+            KEYPOOL.work(int(sys.argv[3]))
+    elif ACTION == 'status':
+        KEYPOOL.print_status()
+    else:
+        print('> Usage: ' + sys.argv[0] + ' keypool [fill N|worker N|status]')
+        exit(1)
+elif len(sys.argv) > 1 and sys.argv[1] == 'list':
+    # List clients from catalogue, filters are applied by database.
+    FILTERS = dict()
+    NDJSON = False
+    ARGUMENTS = sys.argv[2:]
+
+    while ARGUMENTS:
+        ARGUMENT = ARGUMENTS.pop(0)
+        if ARGUMENT in ['--valid', '--revoked']:
+            FILTERS['revoked'] = ARGUMENT == '--revoked'
+        elif ARGUMENT in ['--expiring', '--created-since'] and ARGUMENTS and ARGUMENTS[0].isdigit():
+            DAYS = int(ARGUMENTS.pop(0))
+            if ARGUMENT == '--expiring':
+                FILTERS['expiring_within'] = DAYS * 24 * 60 * 60
+            else:
+                FILTERS['created_within'] = DAYS * 24 * 60 * 60
+        elif ARGUMENT == '--ndjson':
+            NDJSON = True
+        else:
+            print(
+                '> Usage: ' + sys.argv[0] + ' list [--valid|--revoked] [--expiring DAYS]' +
+                ' [--created-since DAYS] [--ndjson]')
+            exit(1)
+
+    CONFIG = SimplifiedOpenvpnConfig()
+    DB = SimplifiedOpenvpnData(CONFIG)
+    SimplifiedOpenvpnIndex(CONFIG, DB).refresh()
+    SimplifiedOpenvpn.print_catalogue(DB.list_clients(**FILTERS), NDJSON)
+elif len(sys.argv) > 1 and sys.argv[1] == 'expiring':
+    # List valid certificates that expire soon from cached certificate metadata.
+    WITHIN = _helper.parse_duration('30d')
+    NDJSON = '--ndjson' in sys.argv[2:]
+    ARGUMENTS = [argument for argument in sys.argv[2:] if argument != '--ndjson']
+
+    if ARGUMENTS[:1] == ['--within'] and len(ARGUMENTS) == 2:
+        WITHIN = _helper.parse_duration(ARGUMENTS[1])
+    elif ARGUMENTS:
+        WITHIN = None
+
+    if WITHIN is None:
+        print('> Usage: ' + sys.argv[0] + ' expiring [--within DURATION] [--ndjson]')
+        exit(1)
+
+    CONFIG = SimplifiedOpenvpnConfig()
+    DB = SimplifiedOpenvpnData(CONFIG)
+    SimplifiedOpenvpnIndex(CONFIG, DB).refresh()
+    SimplifiedOpenvpn.print_catalogue(DB.list_clients(False, WITHIN), NDJSON)
+elif len(sys.argv) > 1 and sys.argv[1] == 'renew':
+    # Reissue certificates of clients.
+    COMMON_NAMES = None
+
+    if len(sys.argv) == 4 and sys.argv[2] == '--batch':
+        COMMON_NAMES = _helper.read_names_from_csv(sys.argv[3])
+    elif len(sys.argv) == 4 and sys.argv[2] == '--expiring':
+        WITHIN = _helper.parse_duration(sys.argv[3])
+        if WITHIN is not None:
+            CONFIG = SimplifiedOpenvpnConfig()
+            DB = SimplifiedOpenvpnData(CONFIG)
+            SimplifiedOpenvpnIndex(CONFIG, DB).refresh()
+            COMMON_NAMES = [record['slug'] for record in DB.list_clients(False, WITHIN)]
+    elif len(sys.argv) > 2 and not sys.argv[2].startswith('--'):
+        COMMON_NAMES = [common_name.strip() for common_name in sys.argv[2:]]
+
+    if COMMON_NAMES is None:
+        print('> Usage: ' + sys.argv[0] + ' renew [Common Name] ...')
+        print('> Usage: ' + sys.argv[0] + ' renew --batch [FILE|-]')
+        print('> Usage: ' + sys.argv[0] + ' renew --expiring DURATION')
+        exit(1)
+
+    SOVPN = SimplifiedOpenvpn()
+    SOVPN.renew_clients(COMMON_NAMES)
+elif len(sys.argv) == 2 and sys.argv[1] == 'gc':
+    # Remove CA and TLS Auth keys that no client references anymore.
+    CONFIG = SimplifiedOpenvpnConfig()
+    ASSETS = SimplifiedOpenvpnAssets(CONFIG.clients_dir)
+    ASSETS.gc([CONFIG.ca_path, CONFIG.ta_path])
 elif len(sys.argv) > 2 and sys.argv[1] == 'kick':
     MGMT = SimplifiedOpenvpnMgmt()
     MGMT.kick(sys.argv[2])
@@ -163,6 +525,16 @@ elif len(sys.argv) == 2 and (sys.argv[1] == 'init' or sys.argv[1] == 'edit'):
         SOVPN = SimplifiedOpenvpn()
         if CONFIG.needs_rotation:
             SOVPN.rotate_share_hashes()
+elif len(sys.argv) > 1 and sys.argv[1] == 'rotate':
+    # Rotate share hashes, optionally committing every chunk.
+    if len(sys.argv) == 4 and sys.argv[2] == '--chunk' and sys.argv[3].isdigit() and \
+            int(sys.argv[3]) >= 1:
+        SimplifiedOpenvpn().rotate_share_hashes(int(sys.argv[3]), True)
+    elif len(sys.argv) == 2:
+        SimplifiedOpenvpn().rotate_share_hashes()
+    else:
+        print('> Usage: ' + sys.argv[0] + ' rotate [--chunk N]')
+        exit(1)
 elif len(sys.argv) > 1 and sys.argv[1] == 'destroy':
     if SimplifiedOpenvpnConfig.needs_setup():
         exit(0)
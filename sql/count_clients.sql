@@ -0,0 +1 @@
+SELECT COUNT(*) FROM clients
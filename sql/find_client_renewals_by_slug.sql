@@ -0,0 +1,2 @@
+SELECT renewals FROM clients
+WHERE slug = ?
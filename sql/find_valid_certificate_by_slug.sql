@@ -0,0 +1,3 @@
+SELECT serial FROM certificates
+WHERE slug = ? AND status = 'V' AND not_after > ?
+LIMIT 1
@@ -1,4 +1,8 @@
 INSERT INTO clients (
     slug,
-    hash
-) VALUES (?, ?)
+    hash,
+    pretty_name,
+    created_at,
+    cert_serial,
+    not_after
+) VALUES (?, ?, ?, ?, ?, ?)
@@ -0,0 +1,9 @@
+ALTER TABLE clients ADD COLUMN pretty_name TEXT;
+ALTER TABLE clients ADD COLUMN created_at INTEGER;
+ALTER TABLE clients ADD COLUMN cert_serial TEXT;
+ALTER TABLE clients ADD COLUMN not_after INTEGER;
+ALTER TABLE clients ADD COLUMN revoked_at INTEGER;
+CREATE INDEX IF NOT EXISTS clients_created_at ON clients (created_at);
+CREATE INDEX IF NOT EXISTS clients_cert_serial ON clients (cert_serial);
+CREATE INDEX IF NOT EXISTS clients_not_after ON clients (not_after);
+CREATE INDEX IF NOT EXISTS clients_revoked_at ON clients (revoked_at);
@@ -0,0 +1,15 @@
+CREATE TABLE IF NOT EXISTS certificates (
+    serial TEXT PRIMARY KEY,
+    slug TEXT,
+    status TEXT,
+    not_after INTEGER,
+    revoked_at INTEGER
+);
+CREATE INDEX IF NOT EXISTS certificates_slug ON certificates (slug, status);
+CREATE INDEX IF NOT EXISTS certificates_not_after ON certificates (not_after);
+CREATE TABLE IF NOT EXISTS index_state (
+    path TEXT PRIMARY KEY,
+    inode INTEGER,
+    offset INTEGER,
+    last_line BLOB
+);
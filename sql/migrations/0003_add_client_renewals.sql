@@ -0,0 +1 @@
+ALTER TABLE clients ADD COLUMN renewals INTEGER NOT NULL DEFAULT 0;
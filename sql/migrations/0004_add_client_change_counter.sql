@@ -0,0 +1,10 @@
+ALTER TABLE clients ADD COLUMN changed INTEGER NOT NULL DEFAULT 0;
+CREATE INDEX IF NOT EXISTS clients_changed ON clients (changed);
+CREATE TRIGGER IF NOT EXISTS clients_inserted AFTER INSERT ON clients
+BEGIN
+    UPDATE clients SET changed = (SELECT MAX(changed) FROM clients) + 1 WHERE id = NEW.id;
+END;
+CREATE TRIGGER IF NOT EXISTS clients_hash_updated AFTER UPDATE OF slug, hash ON clients
+BEGIN
+    UPDATE clients SET changed = (SELECT MAX(changed) FROM clients) + 1 WHERE id = NEW.id;
+END;
@@ -0,0 +1,7 @@
+INSERT OR REPLACE INTO certificates (
+    serial,
+    slug,
+    status,
+    not_after,
+    revoked_at
+) VALUES (?, ?, ?, ?, ?)
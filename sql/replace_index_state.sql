@@ -0,0 +1 @@
+INSERT OR REPLACE INTO index_state (path, inode, offset, last_line) VALUES (?, ?, ?, ?)
@@ -0,0 +1,3 @@
+SELECT hash, slug, changed FROM clients
+WHERE changed > ?
+ORDER BY changed
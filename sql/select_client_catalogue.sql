@@ -0,0 +1 @@
+SELECT slug, pretty_name, created_at, cert_serial, not_after, revoked_at FROM clients
@@ -0,0 +1 @@
+SELECT hash, slug, changed FROM clients
@@ -0,0 +1,4 @@
+SELECT id, slug, renewals FROM clients
+WHERE id > ?
+ORDER BY id
+LIMIT ?
@@ -0,0 +1,2 @@
+SELECT inode, offset, last_line FROM index_state
+WHERE path = ?
@@ -0,0 +1,4 @@
+UPDATE clients SET
+    cert_serial = ?,
+    not_after = ?
+WHERE slug = ? AND (not_after IS NULL OR not_after <= ?)
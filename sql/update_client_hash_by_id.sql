@@ -0,0 +1,3 @@
+UPDATE clients SET
+    hash = ?
+WHERE id = ?
@@ -0,0 +1,7 @@
+UPDATE clients SET
+    hash = ?,
+    cert_serial = ?,
+    not_after = ?,
+    renewals = ?,
+    revoked_at = NULL
+WHERE slug = ?
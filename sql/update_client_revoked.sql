@@ -0,0 +1,3 @@
+UPDATE clients SET
+    revoked_at = ?
+WHERE slug = ?
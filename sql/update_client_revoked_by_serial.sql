@@ -0,0 +1,3 @@
+UPDATE clients SET
+    revoked_at = ?
+WHERE slug = ? AND revoked_at IS NULL AND (cert_serial IS NULL OR cert_serial = ?)